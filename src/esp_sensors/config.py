@@ -202,6 +202,13 @@ def get_display_config(display_type: str, config: dict | None = None) -> dict:
     if display_config is None:
         display_config = DEFAULT_CONFIG.get("displays", {}).get(display_type, {})
 
+    # Parse a hex string I2C address once here instead of in every consumer.
+    # Copy first so the stored config keeps its original (string) form.
+    address = display_config.get("address")
+    if isinstance(address, str):
+        display_config = dict(display_config)
+        display_config["address"] = int(address, 16)
+
     return display_config
 
 
@@ -302,9 +309,9 @@ def check_and_update_config_from_mqtt(
     """
     Check for configuration updates from MQTT and update local configuration if needed.
 
-    This function uses a two-step process:
-    1. Check the version topic to see if a new version is available
-    2. If a new version is detected, fetch the full configuration from the data topic
+    This is a thin wrapper around esp_sensors.mqtt.check_config_update, which
+    checks the version topic and fetches the full configuration from the data
+    topic if a newer version is available.
 
     Args:
         mqtt_client: MQTT client instance
@@ -314,27 +321,7 @@ def check_and_update_config_from_mqtt(
     Returns:
         Updated configuration dictionary if an update was found, otherwise the current configuration
     """
-    if not mqtt_config.get("load_config_from_mqtt", False):
-        print("Loading config from MQTT is disabled")
-        return current_config
-
-    try:
-        # Get the version and data topics
-        topic_config_version = mqtt_config.get("topic_config_version")
-        topic_config_data = mqtt_config.get("topic_config_data")
-
-        if not topic_config_version or not topic_config_data:
-            print("Configuration version or data topic not specified")
-            return current_config
+    # Imported here to avoid loading the MQTT module with the configuration
+    from .mqtt import check_config_update
 
-        # This function is now implemented in the mqtt.py module
-        # We'll import and use that implementation
-        from .mqtt import check_config_update
-
-        # Use the implementation from mqtt.py to check for updates
-        updated_config = check_config_update(mqtt_client, mqtt_config, current_config)
-
-        return updated_config
-    except Exception as e:
-        print(f"Error checking for configuration updates: {e}")
-        return current_config
+    return check_config_update(mqtt_client, mqtt_config, current_config)
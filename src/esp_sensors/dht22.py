@@ -103,7 +103,7 @@ class DHT22Sensor(TemperatureSensor, HumiditySensor):
 
                 # Convert to Fahrenheit if needed
                 if self.unit == "F":
-                    temp = (temp * 9 / 5) + 32
+                    temp = temp * 1.8 + 32
 
                 self._last_reading = round(temp, 1)
                 # Also read humidity while we're at it
@@ -158,25 +158,3 @@ class DHT22Sensor(TemperatureSensor, HumiditySensor):
         metadata["name"] = self.name
         metadata["type"] = "DHT22"
         return metadata
-
-    def to_fahrenheit(self) -> float | None:
-        """
-        Convert the last reading to Fahrenheit if it was in Celsius.
-
-        Returns:
-            The temperature in Fahrenheit
-        """
-        if self.unit == "F" or self._last_reading is None:
-            return self._last_reading
-        return (self._last_reading * 9 / 5) + 32
-
-    def to_celsius(self) -> float | None:
-        """
-        Convert the last reading to Celsius if it was in Fahrenheit.
-
-        Returns:
-            The temperature in Celsius
-        """
-        if self.unit == "C" or self._last_reading is None:
-            return self._last_reading
-        return (self._last_reading - 32) * 5 / 9
@@ -6,6 +6,13 @@ except ModuleNotFoundError:
     SIMULATION = True  # We're in a test environment
     import random  # For generating random values in tests
 
+# Simulated value range for each unit
+_DUMMY_RANGES = {
+    "C": (15.0, 30.0),  # Temperature in Celsius
+    "F": (59.0, 86.0),  # Temperature in Fahrenheit
+    "%": (30.0, 90.0),  # Humidity in percentage
+}
+
 
 def read_dummy(name: str, unit: str) -> float:
     """
@@ -21,16 +28,10 @@ def read_dummy(name: str, unit: str) -> float:
 
     if SIMULATION:
         # Simulation mode - generate random values for testing
-        if unit == "F":
-            # Simulate a temperature reading in Fahrenheit
-            return round(random.uniform(59.0, 86.0), 1)
-        elif unit == "%":
-            # Simulate a humidity reading in percentage
-            return round(random.uniform(30.0, 90.0), 1)
-        elif unit == "C":
-            return round(random.uniform(15.0, 30.0), 1)
-        else:
+        value_range = _DUMMY_RANGES.get(unit)
+        if value_range is None:
             raise ValueError(f"Unsupported unit for dummy sensor: {unit}")
+        return round(random.uniform(*value_range), 1)
     else:
         # This method should be overridden by subclasses to implement
         # actual temperature reading from hardware
@@ -6,13 +6,102 @@ This module provides functionality to connect to an MQTT broker and publish sens
 This module uses the MQTTClient class from mqtt_client.py for the core MQTT implementation.
 """
 
-import json
+import select
+import struct
 import time
 
 from .mqtt_client import (
     MQTTClient,
+    _ticks_diff,
+    _ticks_ms,
 )
 
+try:
+    from micropython import const
+except ImportError:
+
+    def const(value):
+        return value
+
+
+try:
+    from machine import RTC
+except ImportError:
+    RTC = None  # Not on a device; delta suppression state stays in RAM
+
+
+# Enables logging on the publish and message callback paths. As a const,
+# MicroPython strips the guarded print() calls at compile time.
+_DEBUG = const(0)
+
+# Poll events that mean the broker socket is no longer usable
+_POLL_CLOSED = select.POLLHUP | select.POLLERR
+
+# Packets processed at most before a repeated read_topic returns
+_MAX_PENDING_PACKETS = const(8)
+
+# Data topic prefix used when the configuration does not set one
+_DEFAULT_DATA_TOPIC_PREFIX = "/homecontrol/device/data"
+
+# JSON layout of the combined sensor data payload
+_DATA_PAYLOAD = b'{"temperature":%s,"humidity":%s,"uptime":%d,"unit":"%s"}'
+
+# CBOR map header and keys of the binary sensor data payload
+_CBOR_MAP_4 = b"\xa4"
+_CBOR_KEY_TEMPERATURE = b"\x6btemperature"
+_CBOR_KEY_HUMIDITY = b"\x68humidity"
+_CBOR_KEY_UPTIME = b"\x66uptime"
+_CBOR_KEY_UNIT = b"\x64unit"
+_CBOR_NULL = b"\xf6"
+
+# Entries kept in each of the per-sensor caches below before they are reset
+_CACHE_SIZE = const(32)
+
+# Encoded data topics, keyed by (topic prefix, sensor id, topic suffix)
+_data_topics = {}
+
+
+def _load_last_published() -> dict:
+    """
+    Restore the last published readings from RTC memory.
+
+    RTC memory survives deep sleep, unlike module state, so publish_epsilon
+    can compare against the previous cycle.
+
+    Returns:
+        Last published [temperature, humidity, skipped cycles] by sensor id
+    """
+    if RTC is None:
+        return {}
+    try:
+        data = RTC().memory()
+        if data:
+            # json is only needed here, so keep it out of the boot-time imports
+            import json
+
+            return json.loads(data)
+    except Exception as e:
+        print(f"Failed to restore last published readings: {e}")
+    return {}
+
+
+def _save_last_published():
+    """
+    Store the last published readings in RTC memory for the next wake-up.
+    """
+    if RTC is None:
+        return
+    try:
+        import json
+
+        RTC().memory(json.dumps(_last_published).encode("utf-8"))
+    except Exception as e:
+        print(f"Failed to store last published readings: {e}")
+
+
+# Last published [temperature, humidity, skipped cycles], keyed by sensor id
+_last_published = _load_last_published()
+
 
 class ESP32MQTTClient:
     """
@@ -54,8 +143,13 @@ class ESP32MQTTClient:
         self.keepalive = keepalive
         self.ssl = ssl
         self.client = None
+        # Only set once self.client exists, so it is the single readiness check
         self.connected = False
-        self.received_messages = {}  # Store received messages by topic
+        self._await_topic = None  # Topic read_topic is waiting for (bytes)
+        self._await_msg = None  # Message received on _await_topic
+        self._poller = None  # Poll object watching the broker socket
+        # Topics (bytes) subscribed in this session, with the last message seen
+        self._subscribed = {}
 
     def connect(self):
         """
@@ -64,6 +158,8 @@ class ESP32MQTTClient:
         Returns:
             bool: True if connection was successful, False otherwise
         """
+        # A new clean session starts without subscriptions
+        self._subscribed.clear()
         try:
             print(
                 f"[ESP32MQTT] Connecting to {self.server}:{self.port} as {self.client_id}"
@@ -87,6 +183,7 @@ class ESP32MQTTClient:
             result = self.client.connect()
             if result == 0:  # 0 means success in MQTT protocol
                 self.connected = True
+                self._register_poller()
                 print("[ESP32MQTT] Connected successfully")
                 return True
             else:
@@ -98,12 +195,48 @@ class ESP32MQTTClient:
             self.connected = False
             return False
 
+    def _register_poller(self):
+        """
+        Register the broker socket with a poll object for read_topic.
+        """
+        self._poller = select.poll()
+        self._poller.register(self.client.sock, select.POLLIN)
+
+    def _unregister_poller(self):
+        """
+        Release the poll object before the broker socket is closed.
+        """
+        if self._poller is not None:
+            if self.client.sock is not None:
+                self._poller.unregister(self.client.sock)
+            self._poller = None
+
+    def _process_pending(self, poll, closed):
+        """
+        Process the packets already waiting on the socket without blocking.
+
+        Args:
+            poll: Bound poll method of the registered poll object
+            closed: Poll event mask of a closed connection
+        """
+        # Bounded, so a connection that stays readable cannot stall the caller
+        for _ in range(_MAX_PENDING_PACKETS):
+            if self.ssl:
+                # Packets already decrypted by TLS do not wake up poll
+                self.client.check_msg()
+            events = list(poll(0))
+            if not events or events[0][1] & closed:
+                return
+            self.client.check_msg()
+
     def disconnect(self):
         """
         Disconnect from the MQTT broker.
         """
         if self.client and self.connected:
+            self._subscribed.clear()
             try:
+                self._unregister_poller()
                 self.client.disconnect()
                 self.connected = False
                 print("[ESP32MQTT] Disconnected")
@@ -116,7 +249,7 @@ class ESP32MQTTClient:
         Publish a message to a topic.
 
         Args:
-            topic (str): The topic to publish to
+            topic (str or bytes): The topic to publish to, bytes avoids re-encoding
             message (str or bytes): The message to publish
             retain (bool): Whether the message should be retained
             qos (int): Quality of Service level
@@ -124,43 +257,69 @@ class ESP32MQTTClient:
         Returns:
             bool: True if publishing was successful, False otherwise
         """
-        if not self.connected or not self.client:
-            print("[ESP32MQTT] Not connected to broker")
+        if not self.connected:
+            if _DEBUG:
+                print("[ESP32MQTT] Not connected to broker")
             return False
 
         try:
-            # Convert message to bytes if it's not already
-            if isinstance(message, str):
-                message = message.encode()
-
+            # MQTTClient encodes str topics and messages; bytes pass straight through
             self.client.publish(topic, message, retain, qos)
             return True
         except Exception as e:
-            print(f"[ESP32MQTT] Failed to publish: {e}")
+            if _DEBUG:
+                print(f"[ESP32MQTT] Failed to publish: {e}")
             # self.connected = False  # Assume connection is lost on error
             return False
 
+    def publish_many(self, items, retain=False):
+        """
+        Publish several messages in a single socket write.
+
+        Args:
+            items (list): (topic, message) or (topic, message, qos) tuples,
+                topic and message each str or bytes
+            retain (bool): Whether the messages should be retained
+
+        Returns:
+            bool: True if publishing was successful, False otherwise
+        """
+        if not self.connected:
+            if _DEBUG:
+                print("[ESP32MQTT] Not connected to broker")
+            return False
+
+        try:
+            self.client.publish_many(items, retain)
+            return True
+        except Exception as e:
+            if _DEBUG:
+                print(f"[ESP32MQTT] Failed to publish: {e}")
+            return False
+
     def subscribe(self, topic, qos=0):
         """
         Subscribe to a topic.
 
         Args:
-            topic (str): The topic to subscribe to
+            topic (str or bytes): The topic to subscribe to, bytes avoids re-encoding
             qos (int): Quality of Service level
 
         Returns:
             bool: True if subscription was successful, False otherwise
         """
-        if not self.connected or not self.client:
+        if not self.connected:
             print("[ESP32MQTT] Not connected to broker")
             return False
 
         try:
-            # Convert topic to bytes if it's not already
-            if isinstance(topic, str):
-                topic = topic.encode()
-
-            self.client.subscribe(topic, qos)
+            # MQTTClient encodes str topics; bytes pass straight through
+            if not self.client.subscribe(topic, qos):
+                print("[ESP32MQTT] Subscription not confirmed by broker")
+                return False
+            self._subscribed.setdefault(
+                topic if isinstance(topic, bytes) else topic.encode(), None
+            )
             return True
         except Exception as e:
             print(f"[ESP32MQTT] Failed to subscribe: {e}")
@@ -175,64 +334,92 @@ class ESP32MQTTClient:
             topic (bytes): The topic the message was received on
             msg (bytes): The message payload
         """
-        topic_str = topic.decode("utf-8") if isinstance(topic, bytes) else topic
-        msg_str = msg.decode("utf-8") if isinstance(msg, bytes) else msg
-
-        print(f"[ESP32MQTT] Message received on '{topic_str}': len: {len(msg_str)}")
+        if _DEBUG:
+            print(
+                f"[ESP32MQTT] Message received on '{topic.decode()}': len: {len(msg)}"
+            )
 
-        # Store the message
-        self.received_messages[topic_str] = msg
+        # Keep the last message per subscribed topic for repeated reads
+        if topic in self._subscribed:
+            self._subscribed[topic] = msg
+        if topic == self._await_topic:
+            self._await_msg = msg
 
     def read_topic(self, topic, wait_time=5.0):
         """
         Read data from a topic with a configurable wait time.
 
+        The first read subscribes to the topic, so the broker sends its retained
+        message. Later reads in the same session do not subscribe again; they
+        return the last message seen on the topic, after processing packets
+        already waiting, and only wait if none has been received yet.
+
         Args:
-            topic (str): The topic to read from
+            topic (str or bytes): The topic to read from
             wait_time (float): Maximum time to wait for a message in seconds
 
         Returns:
             bytes or None: The message payload if received within wait_time, None otherwise
         """
-        if not self.connected or not self.client:
+        if not self.connected:
             print("[ESP32MQTT] Not connected to broker")
             return None
 
-        # Clear any previous message for this topic
-        topic_str = (
-            topic
-            if isinstance(topic, str)
-            else topic.decode("utf-8") if isinstance(topic, bytes) else str(topic)
-        )
-        if topic_str in self.received_messages:
-            del self.received_messages[topic_str]
+        # Wait for this topic and clear any previous message
+        self._await_topic = topic if isinstance(topic, bytes) else topic.encode()
+        self._await_msg = None
+
+        if self._poller is None:
+            self._register_poller()
+        # MicroPython's ipoll avoids allocating a result list on every call
+        poll = getattr(self._poller, "ipoll", self._poller.poll)
+        closed = _POLL_CLOSED
 
-        # Subscribe to the topic if not already subscribed
-        if not self.subscribe(topic):
+        if self._await_topic in self._subscribed:
+            # The broker only sends retained messages on subscribe, so process
+            # what is already waiting and return the last message seen
+            try:
+                self._process_pending(poll, closed)
+            except Exception as e:
+                print(f"[ESP32MQTT] Error while reading topic: {e}")
+                return None
+            if self._subscribed[self._await_topic] is not None:
+                return self._subscribed[self._await_topic]
+        elif not self.subscribe(self._await_topic):
             print("[ESP32MQTT] Failed to subscribe to topic")
             return None
 
-        # Wait for the message
-        start_time = time.time()
-        while time.time() - start_time < wait_time:
+        # Wait for the message, waking up as soon as the socket becomes readable.
+        # Integer ticks keep millisecond precision and handle wrap-around.
+        start = _ticks_ms()
+        wait_ms = int(wait_time * 1000)
+        remaining = wait_ms
+        while remaining > 0:
             try:
-                # Check for new messages
-                self.client.check_msg()
+                if self.ssl:
+                    # Packets already decrypted by TLS do not wake up poll, so
+                    # process them first and poll in short slices
+                    self.client.check_msg()
+                    if self._await_msg is not None:
+                        return self._await_msg
+                for event in poll(min(remaining, 100) if self.ssl else remaining):
+                    if event[1] & closed:
+                        print("[ESP32MQTT] Connection closed while reading topic")
+                        return None
+
+                    # Process the pending packet
+                    self.client.check_msg()
 
                 # Check if we received a message on this topic
-                if topic_str in self.received_messages:
-                    return self.received_messages[topic_str]
-
-                # Small delay to prevent tight loop
-                time.sleep(0.1)
+                if self._await_msg is not None:
+                    return self._await_msg
             except Exception as e:
                 print(f"[ESP32MQTT] Error while reading topic: {e}")
                 # self.connected = False
                 return None
+            remaining = wait_ms - _ticks_diff(_ticks_ms(), start)
 
-        print(
-            f"[ESP32MQTT] No message received on {topic_str} after {wait_time} seconds"
-        )
+        print(f"[ESP32MQTT] No message received on {topic} after {wait_time} seconds")
         return None
 
 
@@ -259,6 +446,12 @@ def setup_mqtt(mqtt_config: dict) -> ESP32MQTTClient | MQTTClient | None:
         keepalive = mqtt_config.get("keepalive", 60)
         ssl = mqtt_config.get("ssl", False)
 
+        # Encode the config topics once so subscribe/read_topic can reuse the bytes
+        for key in ("topic_config_version", "topic_config_data"):
+            topic = mqtt_config.get(key)
+            if topic:
+                mqtt_config[f"_{key}_b"] = topic.encode("utf-8")
+
         # Get reconnection configuration
         reconnect_config = mqtt_config.get("reconnect", {})
         reconnect_enabled = reconnect_config.get("enabled", True)
@@ -315,38 +508,282 @@ def publish_sensor_data(
         True if publishing was successful, False otherwise
     """
     if client is None:
-        print("MQTT client is not connected")
+        if _DEBUG:
+            print("MQTT client is not connected")
         return False
 
-    try:
-        topic_data_prefix = get_data_topic(mqtt_config)
-        sensor_id = getattr(sensor, "id", sensor.name.lower().replace(" ", "_"))
+    sensor_id = _sensor_id(sensor)
+    epsilon = mqtt_config.get("publish_epsilon", 0)
+    if epsilon and _is_unchanged(
+        sensor_id,
+        temperature,
+        humidity,
+        epsilon,
+        mqtt_config.get("publish_heartbeat", 10),
+    ):
+        if _DEBUG:
+            print("Sensor data unchanged, skipping publish")
+        return True
 
+    topic_data_prefix = get_data_topic(mqtt_config)
+    if mqtt_config.get("binary", False):
+        # Prepare combined data as CBOR
+        data_topic = _get_sensor_data_topic(topic_data_prefix, sensor_id, "data.cbor")
+        data_payload = _encode_cbor_payload(
+            temperature, humidity, int(time.time()), sensor.unit
+        )
+    else:
         # Prepare combined data as JSON
-        data_topic = f"{topic_data_prefix}/{sensor_id}/data"
-        data = {
-            "temperature": temperature,
-            "humidity": humidity,
-            "uptime": time.time(),
-            "unit": sensor.unit,
-        }
-        data_payload = json.dumps(data).encode()
-
-        # Publish the data and check the result
-        publish_success = client.publish(data_topic, data_payload)
-        if publish_success:
-            print(f"Published sensor data to MQTT: '{data_topic}'")
-            return True
+        data_topic = _get_sensor_data_topic(topic_data_prefix, sensor_id)
+        data_payload = _DATA_PAYLOAD % (
+            _json_number(temperature),
+            _json_number(humidity),
+            int(time.time()),
+            _json_string(sensor.unit),
+        )
+
+    if mqtt_config.get("split_topics", False):
+        # Also publish the single readings, batched into one socket write
+        messages = [(data_topic, data_payload)]
+        for suffix, value in (("temperature", temperature), ("humidity", humidity)):
+            if value is not None:
+                messages.append(
+                    (
+                        _get_sensor_data_topic(topic_data_prefix, sensor_id, suffix),
+                        _json_number(value),
+                    )
+                )
+    else:
+        messages = None
+
+    # Retained data lets late subscribers see the last reading right away
+    retain = mqtt_config.get("retain", False)
+
+    # Publish the data and check the result; only the network I/O can fail here
+    try:
+        if messages is None:
+            publish_success = client.publish(data_topic, data_payload, retain=retain)
         else:
-            print("Failed to publish sensor data to MQTT")
-            return False
+            publish_success = client.publish_many(messages, retain=retain)
     except Exception as e:
-        print(f"Failed to publish to MQTT: {e}")
+        if _DEBUG:
+            print(f"Failed to publish to MQTT: {e}")
         return False
 
+    if publish_success:
+        if epsilon:
+            if sensor_id not in _last_published and len(_last_published) >= _CACHE_SIZE:
+                _last_published.clear()
+            _last_published[sensor_id] = [temperature, humidity, 0]
+            _save_last_published()
+        if _DEBUG:
+            print(f"Published sensor data to MQTT: '{data_topic.decode()}'")
+        return True
+    else:
+        if _DEBUG:
+            print("Failed to publish sensor data to MQTT")
+        return False
+
+
+def _json_string(value: str) -> bytes:
+    """
+    Encode a string for the payload template, escaping it only if needed.
+
+    Args:
+        value: The string to encode
+
+    Returns:
+        The JSON string contents (without quotes) as bytes
+    """
+    encoded = value.encode("utf-8")
+    if b'"' in encoded or b"\\" in encoded or any(c < 0x20 for c in encoded):
+        import json
+
+        return json.dumps(value)[1:-1].encode("utf-8")
+    return encoded
+
+
+def _is_unchanged(
+    sensor_id: str, temperature, humidity, epsilon, heartbeat: int
+) -> bool:
+    """
+    Check whether readings can be skipped because they match the last publish.
+
+    Every heartbeat-th unchanged cycle is still published, so retained data
+    does not go stale.
+
+    Args:
+        sensor_id: Id of the sensor
+        temperature: Temperature reading
+        humidity: Humidity reading
+        epsilon: Smallest change that is published
+        heartbeat: Number of cycles after which unchanged data is published
+
+    Returns:
+        True if the publish can be skipped, False otherwise
+    """
+    last = _last_published.get(sensor_id)
+    if last is None:
+        return False
+    if not (
+        _is_close(last[0], temperature, epsilon)
+        and _is_close(last[1], humidity, epsilon)
+    ):
+        return False
+    last[2] += 1
+    _save_last_published()
+    return last[2] < heartbeat
+
+
+def _is_close(last, value, epsilon) -> bool:
+    """
+    Check whether a reading is within epsilon of the last published one.
+    """
+    if last is None or value is None:
+        return last is value
+    return abs(value - last) < epsilon
+
+
+def _sensor_id(sensor) -> str:
+    """
+    Get the id used in a sensor's topics.
+
+    Args:
+        sensor: Sensor instance
+
+    Returns:
+        The sensor id, derived from the name if the sensor has none
+    """
+    if hasattr(sensor, "id"):
+        return sensor.id
+    return sensor.name.lower().replace(" ", "_")
+
+
+def _get_sensor_data_topic(
+    topic_data_prefix: str, sensor_id: str, suffix: str = "data"
+) -> bytes:
+    """
+    Get the encoded data topic for a sensor, building it only on first use.
+
+    Args:
+        topic_data_prefix: Prefix of the data topics
+        sensor_id: Id of the sensor
+        suffix: Last level of the topic
+
+    Returns:
+        The data topic as bytes
+    """
+    key = (topic_data_prefix, sensor_id, suffix)
+    data_topic = _data_topics.get(key)
+    if data_topic is None:
+        # Keep the cache bounded; it only ever holds a few topics in practice
+        if len(_data_topics) >= _CACHE_SIZE:
+            _data_topics.clear()
+        data_topic = f"{topic_data_prefix}/{sensor_id}/{suffix}".encode("utf-8")
+        _data_topics[key] = data_topic
+    return data_topic
+
+
+def _json_number(value) -> bytes:
+    """
+    Encode a sensor reading as a JSON number.
+
+    Readings are formatted straight to bytes with two decimals, which avoids
+    building an intermediate str and keeps long float tails off the wire.
+
+    Args:
+        value: The reading (int, float or None)
+
+    Returns:
+        The JSON representation as bytes
+    """
+    if value is None:
+        return b"null"
+    return b"%.2f" % value
+
+
+def _encode_cbor_payload(temperature, humidity, uptime: int, unit: str) -> bytes:
+    """
+    Encode the combined sensor data as a CBOR map.
+
+    Readings are encoded as single-precision floats, which is the native float
+    size of MicroPython on the ESP32.
+
+    Args:
+        temperature: Temperature reading (or None)
+        humidity: Humidity reading (or None)
+        uptime: Uptime in seconds
+        unit: Temperature unit
+
+    Returns:
+        The CBOR encoded payload
+    """
+    unit = unit.encode("utf-8")
+    return b"".join(
+        (
+            _CBOR_MAP_4,
+            _CBOR_KEY_TEMPERATURE,
+            _cbor_float(temperature),
+            _CBOR_KEY_HUMIDITY,
+            _cbor_float(humidity),
+            _CBOR_KEY_UPTIME,
+            _cbor_head(0x00, uptime),
+            _CBOR_KEY_UNIT,
+            _cbor_head(0x60, len(unit)),
+            unit,
+        )
+    )
+
+
+def _cbor_float(value) -> bytes:
+    """
+    Encode a reading as a CBOR single-precision float, or null for None.
+    """
+    if value is None:
+        return _CBOR_NULL
+    return b"\xfa" + struct.pack(">f", value)
+
+
+def _cbor_head(major: int, value: int) -> bytes:
+    """
+    Encode a CBOR data item head for an unsigned argument.
+
+    Args:
+        major: Major type, already shifted into the top three bits
+        value: The argument (integer value or length)
+
+    Returns:
+        The encoded head
+    """
+    if value < 24:
+        return bytes((major | value,))
+    if value < 0x100:
+        return bytes((major | 24, value))
+    if value < 0x10000:
+        return bytes((major | 25,)) + struct.pack(">H", value)
+    if value < 0x100000000:
+        return bytes((major | 26,)) + struct.pack(">I", value)
+    return bytes((major | 27,)) + struct.pack(">Q", value)
+
 
 def get_data_topic(mqtt_config):
-    return mqtt_config.get("topic_data_prefix", "/homecontrol/device/data")
+    """
+    Get the prefix of the sensor data topics.
+
+    The resolved prefix is cached in mqtt_config, so later calls are a
+    single dictionary lookup.
+
+    Args:
+        mqtt_config: MQTT configuration dictionary
+
+    Returns:
+        The data topic prefix
+    """
+    prefix = mqtt_config.get("_topic_prefix_cached")
+    if prefix is None:
+        prefix = mqtt_config.get("topic_data_prefix", _DEFAULT_DATA_TOPIC_PREFIX)
+        mqtt_config["_topic_prefix_cached"] = prefix
+    return prefix
 
 
 def subscribe_to_config(
@@ -374,9 +811,14 @@ def subscribe_to_config(
 
         print(f"Subscribing to configuration version topic: {topic_config_version}")
 
-        # Both client types have compatible subscribe methods
-        client.subscribe(topic_config_version.encode())
-        return True
+        # Both client types have compatible subscribe methods, returning
+        # False when the broker did not confirm the subscription
+        return bool(
+            client.subscribe(
+                mqtt_config.get("_topic_config_version_b")
+                or topic_config_version.encode("utf-8")
+            )
+        )
     except Exception as e:
         print(f"Failed to subscribe to configuration version topic: {e}")
         return False
@@ -496,7 +938,9 @@ def check_config_update(
         print(
             f"Reading from version topic: {topic_config_version} with wait time: {wait_time}s"
         )
-        version_msg = client.read_topic(topic_config_version, wait_time)
+        version_msg = client.read_topic(
+            mqtt_config.get("_topic_config_version_b", topic_config_version), wait_time
+        )
 
         if version_msg:
             try:
@@ -521,16 +965,17 @@ def check_config_update(
             print(
                 f"Reading from data topic: {topic_config_data} with wait time: {wait_time}s"
             )
-            config_msg = client.read_topic(topic_config_data, wait_time)
+            config_msg = client.read_topic(
+                mqtt_config.get("_topic_config_data_b", topic_config_data), wait_time
+            )
 
             if config_msg:
+                # json is only needed here, so keep it out of the boot-time imports
+                import json
+
                 try:
-                    msg_str = (
-                        config_msg.decode("utf-8")
-                        if isinstance(config_msg, bytes)
-                        else config_msg
-                    )
-                    received_config = json.loads(msg_str)
+                    # json.loads decodes bytes itself, no need for a str copy
+                    received_config = json.loads(config_msg)
                 except Exception as e:
                     print(f"Error parsing configuration message: {e}")
 
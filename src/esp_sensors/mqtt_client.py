@@ -5,12 +5,44 @@ This module provides a basic MQTT client implementation from scratch,
 without relying on umqtt. It handles the low-level details of the MQTT protocol
 and provides a simple interface for connecting to an MQTT broker, publishing
 messages, and subscribing to topics.
+
+The module runs on MicroPython, so it must stay plain Python without NumPy,
+Numba or Cython.
 """
 
+import select
 import socket
 import struct
 import time
 
+try:
+    from micropython import const
+except ImportError:
+
+    def const(value):
+        return value
+
+
+try:
+    from time import ticks_add as _ticks_add
+    from time import ticks_diff as _ticks_diff
+    from time import ticks_ms as _ticks_ms
+except ImportError:
+
+    def _ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def _ticks_add(ticks, delta):
+        return ticks + delta
+
+    def _ticks_diff(end, start):
+        return end - start
+
+
+# Enables connect diagnostics and warnings on the receive and publish paths.
+# As a const, MicroPython strips the guarded print() calls at compile time.
+_DEBUG = const(0)
+
 # MQTT Protocol Constants
 MQTT_PROTOCOL_LEVEL = 4  # MQTT 3.1.1
 MQTT_CLEAN_SESSION = 1
@@ -28,6 +60,11 @@ PINGREQ = 0xC0
 PINGRESP = 0xD0
 DISCONNECT = 0xE0
 
+# Complete packets (fixed header only) and fixed headers that never change
+_PINGREQ_PACKET = bytes((PINGREQ, 0))
+_DISCONNECT_PACKET = bytes((DISCONNECT, 0))
+_PUBACK_HEADER = bytes((PUBACK, 2))
+
 # MQTT Connection Return Codes
 CONN_ACCEPTED = 0
 CONN_REFUSED_PROTOCOL = 1
@@ -36,6 +73,19 @@ CONN_REFUSED_SERVER = 3
 CONN_REFUSED_USER_PASS = 4
 CONN_REFUSED_AUTH = 5
 
+# Precompiled big-endian 16-bit packer, used for lengths and packet IDs
+try:
+    _U16 = struct.Struct("!H")
+    _u16_pack = _U16.pack
+    _u16_pack_into = _U16.pack_into
+except AttributeError:  # MicroPython's struct has no Struct class
+
+    def _u16_pack(value):
+        return struct.pack("!H", value)
+
+    def _u16_pack_into(buf, offset, value):
+        struct.pack_into("!H", buf, offset, value)
+
 
 class MQTTException(Exception):
     """MQTT Exception class for handling MQTT-specific errors"""
@@ -63,10 +113,12 @@ class MQTTClient:
         connected (bool): Whether the client is connected to the broker
         callback (callable): Callback function for received messages
         pid (int): Packet ID for message tracking
-        subscriptions (dict): Dictionary of subscribed topics
-        last_ping (float): Timestamp of the last ping
+        next_ping (int): Tick deadline (ms) of the next keepalive ping, None if not due
     """
 
+    # TLS context shared by all clients, created on the first TLS connect
+    _ssl_ctx = None
+
     def __init__(
         self,
         client_id,
@@ -100,8 +152,16 @@ class MQTTClient:
         self.connected = False
         self.callback = None
         self.pid = 0  # Packet ID for message tracking
-        self.subscriptions = {}  # Track subscribed topics
-        self.last_ping = 0
+        # Subscribed topics as bytes, with their QoS at the same index
+        self._sub_topics = []
+        self._sub_qos = []
+        self.next_ping = None
+        self._ping_sent = None  # Ticks when the unanswered PINGREQ was sent
+        self._tx_buf = bytearray(1024)  # Reused buffer for outgoing publishes
+        self._connect_payload = None  # CONNECT payload, built on first connect
+        self._poller = None  # Readiness poller for sock, created on first check_msg
+        self._tls_session = None  # TLS session of the last connection, for resumption
+        self._sock_timeout = None  # Timeout currently set on sock
 
     def _generate_packet_id(self):
         """
@@ -110,7 +170,8 @@ class MQTTClient:
         Returns:
             int: A unique packet ID between 1 and 65535
         """
-        self.pid = (self.pid + 1) % 65536
+        # Packet ID 0 is not allowed by MQTT, so wrap around to 1
+        self.pid = (self.pid + 1) & 0xFFFF or 1
         return self.pid
 
     def _encode_length(self, length):
@@ -121,18 +182,25 @@ class MQTTClient:
             length (int): The length to encode
 
         Returns:
-            bytearray: The encoded length
+            bytes: The encoded length
         """
-        result = bytearray()
-        while True:
-            byte = length % 128
-            length = length // 128
-            if length > 0:
-                byte |= 0x80
-            result.append(byte)
-            if length == 0:
-                break
-        return result
+        # At most 4 bytes; sensor packets almost always need only one
+        if length < 0x80:
+            return bytes((length,))
+        if length < 0x4000:
+            return bytes((length & 0x7F | 0x80, length >> 7))
+        if length < 0x200000:
+            return bytes(
+                (length & 0x7F | 0x80, (length >> 7) & 0x7F | 0x80, length >> 14)
+            )
+        return bytes(
+            (
+                length & 0x7F | 0x80,
+                (length >> 7) & 0x7F | 0x80,
+                (length >> 14) & 0x7F | 0x80,
+                length >> 21,
+            )
+        )
 
     def _encode_string(self, string):
         """
@@ -142,11 +210,11 @@ class MQTTClient:
             string (str or bytes): The string to encode
 
         Returns:
-            bytearray: The encoded string
+            bytes: The encoded string
         """
         if isinstance(string, str):
             string = string.encode("utf-8")
-        return bytearray(struct.pack("!H", len(string)) + string)
+        return _u16_pack(len(string)) + string
 
     def _send_packet(self, packet_type, payload=b""):
         """
@@ -159,23 +227,33 @@ class MQTTClient:
         Raises:
             MQTTException: If the client is not connected or sending fails
         """
-        if self.sock is None:
-            raise MQTTException("Not connected to broker (_send_packet)")
+        # Fixed header and payload go out in a single, exactly sized buffer
+        length = self._encode_length(len(payload))
+        offset = 1 + len(length)
+        packet = bytearray(offset + len(payload))
+        packet[0] = packet_type
+        packet[1:offset] = length
+        if payload:
+            packet[offset:] = payload
+        self._send_raw(packet)
 
-        # Construct the packet
-        packet = bytearray()
-        packet.append(packet_type)
+    def _send_raw(self, packet):
+        """
+        Send a fully encoded packet to the broker.
 
-        # Add remaining length
-        packet.extend(self._encode_length(len(payload)))
+        sendall is used since send may transmit only part of the packet.
 
-        # Add payload
-        if payload:
-            packet.extend(payload)
+        Args:
+            packet (bytes or bytearray): The encoded packet
+
+        Raises:
+            MQTTException: If the client is not connected or sending fails
+        """
+        if self.sock is None:
+            raise MQTTException("Not connected to broker (_send_raw)")
 
-        # Send the packet
         try:
-            self.sock.send(packet)
+            self.sock.sendall(packet)
         except Exception as e:
             self.connected = False
             raise MQTTException(f"Failed to send packet: {e}")
@@ -196,71 +274,107 @@ class MQTTClient:
         if self.sock is None:
             raise MQTTException("Not connected to broker (_recv_packet)")
 
-        # Set socket timeout
-        self.sock.settimeout(timeout)
+        # Set socket timeout, skipping the syscall when it is already in effect
+        if timeout != self._sock_timeout:
+            self.sock.settimeout(timeout)
+            self._sock_timeout = timeout
 
         try:
-            # Read packet type
-            packet_type = self.sock.recv(1)
-            if not packet_type:
+            # Read packet type and the first remaining length byte in one call;
+            # packets are never over-read, so poll() on the socket stays accurate
+            header = self.sock.recv(2)
+            if not header:
                 return None, None
+            if len(header) < 2:
+                try:
+                    byte_data = self.sock.recv(1)
+                except socket.timeout:
+                    if _DEBUG:
+                        print("Warning: Timeout while reading remaining length")
+                    return None, None
+                if not byte_data:
+                    if _DEBUG:
+                        print(
+                            "Warning: Incomplete packet received (no remaining length byte)"
+                        )
+                    return None, None
+                header += byte_data
+            packet_type = header[0]
 
             # Read remaining length
-            remaining_length = 0
-            multiplier = 1
-            max_iterations = (
-                4  # MQTT spec says remaining length field is at most 4 bytes
-            )
-            iterations = 0
-
-            while iterations < max_iterations:
+            byte = header[1]
+            remaining_length = byte & 0x7F
+            multiplier = 128
+            iterations = 1
+            # MQTT spec says remaining length field is at most 4 bytes
+            while byte & 0x80:
+                if iterations == 4:
+                    if _DEBUG:
+                        print(
+                            "Warning: Malformed remaining length field (too many bytes)"
+                        )
+                    return None, None
                 iterations += 1
                 try:
                     byte_data = self.sock.recv(1)
-                    if not byte_data:
+                except socket.timeout:
+                    if _DEBUG:
+                        print("Warning: Timeout while reading remaining length")
+                    return None, None
+                if not byte_data:
+                    if _DEBUG:
                         print(
                             "Warning: Incomplete packet received (no remaining length byte)"
                         )
-                        return None, None
-
-                    byte = byte_data[0]
-                    remaining_length += (byte & 0x7F) * multiplier
-                    multiplier *= 128
-
-                    if not (byte & 0x80):
-                        break
-                except socket.timeout:
-                    print("Warning: Timeout while reading remaining length")
                     return None, None
 
-            if iterations == max_iterations and (byte & 0x80):
-                print("Warning: Malformed remaining length field (too many bytes)")
-                return None, None
+                byte = byte_data[0]
+                remaining_length += (byte & 0x7F) * multiplier
+                multiplier *= 128
 
             # Read the payload
             if remaining_length > 0:
                 try:
-                    payload = bytearray()
-                    bytes_received = 0
+                    # Small packets usually arrive in a single chunk
+                    chunk = self.sock.recv(min(1024, remaining_length))
+                    if not chunk:  # Connection closed
+                        if _DEBUG:
+                            print("Warning: Connection closed while reading payload")
+                        return None, None
+                    if len(chunk) == remaining_length:
+                        return packet_type, chunk
+
+                    # Read the rest straight into a payload buffer of the final
+                    # size, instead of allocating and copying every chunk
+                    payload = bytearray(remaining_length)
+                    bytes_received = len(chunk)
+                    payload[:bytes_received] = chunk
+                    view = memoryview(payload)
+                    # MicroPython sockets have readinto instead of recv_into
+                    recv_into = getattr(self.sock, "recv_into", None)
+                    if recv_into is None:
+                        recv_into = self.sock.readinto
 
-                    # Read in chunks to handle timeouts better
                     while bytes_received < remaining_length:
-                        chunk = self.sock.recv(
-                            min(1024, remaining_length - bytes_received)
+                        count = recv_into(
+                            view[bytes_received:], remaining_length - bytes_received
                         )
-                        if not chunk:  # Connection closed
-                            print("Warning: Connection closed while reading payload")
+                        if not count:  # Connection closed
+                            if _DEBUG:
+                                print(
+                                    "Warning: Connection closed while reading payload"
+                                )
                             return None, None
 
-                        payload.extend(chunk)
-                        bytes_received += len(chunk)
+                        bytes_received += count
 
-                    return packet_type[0], payload
+                    return packet_type, payload
                 except socket.timeout:
-                    print("Warning: Timeout while reading payload")
+                    if _DEBUG:
+                        print("Warning: Timeout while reading payload")
                     return None, None
             else:
-                return packet_type[0], b""
+                return packet_type, b""
 
         except Exception as e:
             # self.connected = False
@@ -270,6 +384,8 @@ class MQTTClient:
         """
         Connect to the MQTT broker.
 
+        The socket is tuned for small interactive packets, see _tune_socket.
+
         Returns:
             int: 0 if successful, otherwise an error code
 
@@ -277,53 +393,65 @@ class MQTTClient:
             MQTTException: If connection fails
         """
         # Create socket
+        self._poller = None
+        self._sock_timeout = None
+        self._ping_sent = None
         try:
             self.sock = socket.socket()
-            print(
-                f"[MQTT] Connecting to Socket {self.server}:{self.port} as {self.client_id}"
-            )
+            if _DEBUG:
+                print(
+                    f"[MQTT] Connecting to Socket {self.server}:{self.port} as {self.client_id}"
+                )
             self.sock.connect((self.server, self.port))
-            print(f"[MQTT] Connected to {self.server}:{self.port}")
+            if _DEBUG:
+                print(f"[MQTT] Connected to {self.server}:{self.port}")
+            self._tune_socket()
+            if self.ssl:
+                self.sock = self._wrap_tls(self.sock)
         except Exception as e:
-            print(f"Error connecting to MQTT broker: {e}")
             raise MQTTException(f"Failed to connect to {self.server}:{self.port}: {e}")
 
-        # Construct CONNECT packet
-        payload = bytearray()
+        # Construct CONNECT packet; the credentials do not change between
+        # reconnects, so the payload is only built once
+        if self._connect_payload is None:
+            payload = bytearray()
+
+            # Protocol name and level
+            payload.extend(self._encode_string("MQTT"))
+            payload.append(MQTT_PROTOCOL_LEVEL)
 
-        # Protocol name and level
-        payload.extend(self._encode_string("MQTT"))
-        payload.append(MQTT_PROTOCOL_LEVEL)
+            # Connect flags
+            connect_flags = 0
+            if self.user:
+                connect_flags |= 0x80
+            if self.password:
+                connect_flags |= 0x40
+            connect_flags |= MQTT_CLEAN_SESSION << 1
+            payload.append(connect_flags)
 
-        # Connect flags
-        connect_flags = 0
-        if self.user:
-            connect_flags |= 0x80
-        if self.password:
-            connect_flags |= 0x40
-        connect_flags |= MQTT_CLEAN_SESSION << 1
-        payload.append(connect_flags)
+            # Keepalive (in seconds)
+            payload.extend(_u16_pack(self.keepalive))
 
-        # Keepalive (in seconds)
-        payload.extend(struct.pack("!H", self.keepalive))
+            # Client ID
+            payload.extend(self._encode_string(self.client_id))
 
-        # Client ID
-        payload.extend(self._encode_string(self.client_id))
+            # Username and password if provided
+            if self.user:
+                payload.extend(self._encode_string(self.user))
+            if self.password:
+                payload.extend(self._encode_string(self.password))
 
-        # Username and password if provided
-        if self.user:
-            payload.extend(self._encode_string(self.user))
-        if self.password:
-            payload.extend(self._encode_string(self.password))
+            self._connect_payload = bytes(payload)
 
         # Send CONNECT packet
-        self._send_packet(CONNECT, payload)
+        self._send_packet(CONNECT, self._connect_payload)
 
         # Wait for CONNACK
         packet_type, payload = self._recv_packet()
         if packet_type is None:
             # Timeout occurred, log the issue but don't crash
-            print("Warning: Timeout waiting for CONNACK")
+            if _DEBUG:
+                print("Warning: Timeout waiting for CONNACK")
             return 1  # Return non-zero to indicate connection failure
         elif packet_type != CONNACK:
             raise MQTTException(f"Unexpected response from broker: {packet_type}")
@@ -336,43 +464,137 @@ class MQTTClient:
             raise MQTTException(f"Connection refused: {payload[1]}")
 
         self.connected = True
-        self.last_ping = time.time()
+        self._schedule_ping()
+        if self.ssl:
+            # Session tickets may arrive after the handshake, so keep the
+            # session once the broker has answered
+            self._tls_session = getattr(self.sock, "session", None)
         return 0
 
+    def _tune_socket(self):
+        """
+        Set TCP options on the connected socket, skipping any the platform lacks.
+
+        Nagle's algorithm is disabled (TCP_NODELAY), since MQTT packets from a
+        sensor are small. With a keepalive set, TCP keepalive and
+        TCP_USER_TIMEOUT make a dead broker connection fail within one
+        keepalive interval instead of hanging in the TCP retransmit timers.
+        """
+        options = [("IPPROTO_TCP", "TCP_NODELAY", 1)]
+        if self.keepalive > 0:
+            options.append(("SOL_SOCKET", "SO_KEEPALIVE", 1))
+            options.append(("IPPROTO_TCP", "TCP_USER_TIMEOUT", self.keepalive * 1000))
+        for level, name, value in options:
+            try:
+                self.sock.setsockopt(
+                    getattr(socket, level), getattr(socket, name), value
+                )
+            except (AttributeError, OSError):
+                pass  # Not available on every platform / MicroPython port
+
+    def _wrap_tls(self, sock):
+        """
+        Wrap a connected socket in TLS.
+
+        On CPython a shared context is used and the session of the previous
+        connection is offered for resumption, which skips most of the handshake
+        on reconnects. MicroPython's ssl module has neither, so it falls back to
+        a plain ssl.wrap_socket.
+
+        Args:
+            sock (socket.socket): The connected socket
+
+        Returns:
+            The TLS wrapped socket
+        """
+        import ssl
+
+        if not hasattr(ssl, "create_default_context"):
+            return ssl.wrap_socket(sock, server_hostname=self.server)
+
+        if MQTTClient._ssl_ctx is None:
+            MQTTClient._ssl_ctx = ssl.create_default_context()
+        return MQTTClient._ssl_ctx.wrap_socket(
+            sock, server_hostname=self.server, session=self._tls_session
+        )
+
     def disconnect(self):
         """
         Disconnect from the MQTT broker.
         """
         if self.connected:
             try:
-                self._send_packet(DISCONNECT)
+                self._send_raw(_DISCONNECT_PACKET)
                 self.sock.close()
             except Exception as e:
                 print(f"Error during disconnect: {e}")
             finally:
                 self.connected = False
                 self.sock = None
+                self._poller = None
+                self._sock_timeout = None
+                self.next_ping = None
+                self._ping_sent = None
 
     def ping(self):
         """
         Send PINGREQ to keep the connection alive.
 
-        Raises:
-            MQTTException: If no PINGRESP is received
+        The PINGRESP is not waited for here; it is consumed by check_msg or
+        while waiting for another acknowledgement. If it has not arrived
+        within half the keepalive interval, the connection is considered lost.
+        With keepalive disabled (0) the response is not tracked.
         """
         if self.connected:
-            self._send_packet(PINGREQ)
-            packet_type, _ = self._recv_packet()
-            if packet_type is None:
-                # Timeout occurred, log the issue but don't crash
-                print("Warning: Timeout waiting for PINGRESP")
-                # Still update the last_ping time to prevent continuous ping attempts
-                self.last_ping = time.time()
-            elif packet_type != PINGRESP:
-                self.connected = False
-                raise MQTTException("No PINGRESP received")
-            else:
-                self.last_ping = time.time()
+            self._send_raw(_PINGREQ_PACKET)
+            if self.keepalive > 0:
+                self._ping_sent = _ticks_ms()
+            self._schedule_ping()
+
+    def _schedule_ping(self):
+        """
+        Set the deadline of the next keepalive ping, one keepalive from now.
+        """
+        if self.keepalive > 0:
+            self.next_ping = _ticks_add(_ticks_ms(), self.keepalive * 1000)
+        else:
+            self.next_ping = None
+
+    def _ping_if_due(self):
+        """
+        Send PINGREQ if the keepalive deadline has passed.
+
+        Raises:
+            MQTTException: If the last PINGREQ went unanswered for half the
+                keepalive interval
+        """
+        if self._ping_sent is not None:
+            if _ticks_diff(_ticks_ms(), self._ping_sent) > self.keepalive * 500:
+                # The PINGRESP may just not have been read yet; stop at EOF,
+                # which poll keeps reporting as readable
+                while self._ping_sent is not None and self._msg_pending():
+                    if not self._process_msg():
+                        break
+                if self._ping_sent is not None:
+                    self.connected = False
+                    raise MQTTException("No PINGRESP received")
+        elif (
+            self.next_ping is not None and _ticks_diff(_ticks_ms(), self.next_ping) >= 0
+        ):
+            self.ping()
+
+    def _recv_reply(self):
+        """
+        Receive the next packet, consuming a PINGRESP that arrives first.
+
+        Returns:
+            tuple: (packet_type, payload) or (None, None) if no packet received
+        """
+        while True:
+            packet_type, payload = self._recv_packet()
+            if packet_type != PINGRESP:
+                return packet_type, payload
+            self._ping_sent = None
 
     def publish(self, topic, msg, retain=False, qos=0):
         """
@@ -387,19 +609,37 @@ class MQTTClient:
         Raises:
             MQTTException: If the client is not connected or publishing fails
         """
-        if not self.connected:
-            raise MQTTException("Not connected to broker (publish)")
-
-        # Check if we need to ping to keep connection alive
-        if self.keepalive > 0 and time.time() - self.last_ping >= self.keepalive:
-            self.ping()
-
         # Convert topic and message to bytes if they're not already
         if isinstance(topic, str):
             topic = topic.encode("utf-8")
         if isinstance(msg, str):
             msg = msg.encode("utf-8")
 
+        self._publish_raw(topic, msg, retain, qos)
+
+    def _publish_raw(self, topic, msg, retain=False, qos=0):
+        """
+        Publish an already encoded message to an already encoded topic.
+
+        Fast path behind publish() without type checks or encoding. Callers
+        publishing to a constant topic can encode it once and call this
+        directly.
+
+        Args:
+            topic (bytes): The topic to publish to
+            msg (bytes): The message to publish
+            retain (bool): Whether the message should be retained by the broker
+            qos (int): Quality of Service level (0 or 1)
+
+        Raises:
+            MQTTException: If the client is not connected or publishing fails
+        """
+        if not self.connected:
+            raise MQTTException("Not connected to broker (publish)")
+
+        # Check if we need to ping to keep connection alive
+        self._ping_if_due()
+
         # Construct PUBLISH packet
         packet_type = PUBLISH
         if retain:
@@ -407,29 +647,111 @@ class MQTTClient:
         if qos:
             packet_type |= qos << 1
 
-        # Payload: topic + message
-        payload = self._encode_string(topic)
-
-        # Add packet ID for QoS > 0
+        # Write header, topic, packet ID (QoS > 0) and message into the reused
+        # transmit buffer, growing it only for unusually large messages
+        topic_len = len(topic)
+        remaining_length = 2 + topic_len + (2 if qos > 0 else 0) + len(msg)
+        length = self._encode_length(remaining_length)
+        offset = 1 + len(length)
+        end = offset + remaining_length
+        packet = self._tx_buf
+        if end > len(packet):
+            packet = self._tx_buf = bytearray(end)
+        packet[0] = packet_type
+        packet[1:offset] = length
+        _u16_pack_into(packet, offset, topic_len)
+        offset += 2
+        packet[offset : offset + topic_len] = topic
+        offset += topic_len
         if qos > 0:
-            pid = self._generate_packet_id()
-            payload.extend(struct.pack("!H", pid))
-
-        payload.extend(msg)
+            _u16_pack_into(packet, offset, self._generate_packet_id())
+            offset += 2
+        packet[offset:end] = msg
 
         # Send PUBLISH packet
-        self._send_packet(packet_type, payload)
+        self._send_raw(memoryview(packet)[:end])
 
         # For QoS 1, wait for PUBACK
         if qos == 1:
-            packet_type, _ = self._recv_packet()
+            packet_type, _ = self._recv_reply()
             if packet_type is None:
                 # Timeout occurred, log the issue but don't crash
-                print("Warning: Timeout waiting for PUBACK")
+                if _DEBUG:
+                    print("Warning: Timeout waiting for PUBACK")
             elif packet_type != PUBACK:
                 raise MQTTException(f"No PUBACK received: {packet_type}")
 
-        return
+    def publish_many(self, items, retain=False):
+        """
+        Publish several messages in a single socket write.
+
+        All PUBLISH packets are assembled into one buffer so they leave the
+        device as one write instead of one per message. For QoS 1 messages the
+        PUBACKs are collected after the whole batch has been sent.
+
+        Args:
+            items (list): (topic, msg) or (topic, msg, qos) tuples, topic and
+                msg each str or bytes, qos 0 (default) or 1
+            retain (bool): Whether the messages should be retained by the broker
+
+        Raises:
+            MQTTException: If the client is not connected or sending fails
+        """
+        if not self.connected or self.sock is None:
+            raise MQTTException("Not connected to broker (publish_many)")
+
+        # Check if we need to ping to keep connection alive
+        self._ping_if_due()
+
+        base_type = PUBLISH | 0x01 if retain else PUBLISH
+        buf = self._tx_buf
+        offset = 0
+        pending_acks = 0
+        for item in items:
+            topic, msg = item[0], item[1]
+            qos = item[2] if len(item) > 2 else 0
+            if isinstance(topic, str):
+                topic = topic.encode("utf-8")
+            if isinstance(msg, str):
+                msg = msg.encode("utf-8")
+            topic_len = len(topic)
+            msg_len = len(msg)
+            pid_len = 2 if qos else 0
+            length = self._encode_length(2 + topic_len + pid_len + msg_len)
+
+            # Grow the buffer if this packet does not fit
+            end = offset + 1 + len(length) + 2 + topic_len + pid_len + msg_len
+            if end > len(buf):
+                buf.extend(bytearray(end - len(buf)))
+
+            # Write the packet in place
+            buf[offset] = base_type | qos << 1
+            offset += 1
+            buf[offset : offset + len(length)] = length
+            offset += len(length)
+            _u16_pack_into(buf, offset, topic_len)
+            offset += 2
+            buf[offset : offset + topic_len] = topic
+            offset += topic_len
+            if qos:
+                _u16_pack_into(buf, offset, self._generate_packet_id())
+                offset += 2
+                pending_acks += 1
+            buf[offset : offset + msg_len] = msg
+            offset += msg_len
+
+        self._send_raw(memoryview(buf)[:offset])
+
+        # Drain the PUBACKs of the QoS 1 messages
+        for _ in range(pending_acks):
+            packet_type, _ = self._recv_reply()
+            if packet_type is None:
+                # Timeout occurred, log the issue but don't crash
+                if _DEBUG:
+                    print("Warning: Timeout waiting for PUBACK")
+                break
+            elif packet_type != PUBACK:
+                raise MQTTException(f"No PUBACK received: {packet_type}")
 
     def subscribe(self, topic, qos=0):
         """
@@ -439,6 +761,10 @@ class MQTTClient:
             topic (str or bytes): The topic to subscribe to
             qos (int): Quality of Service level
 
+        Returns:
+            bool: True once the broker granted the subscription, False if the
+                SUBACK timed out or reported a failure
+
         Raises:
             MQTTException: If the client is not connected or subscription fails
         """
@@ -446,8 +772,7 @@ class MQTTClient:
             raise MQTTException("Not connected to broker (subscribe)")
 
         # Check if we need to ping to keep connection alive
-        if self.keepalive > 0 and time.time() - self.last_ping >= self.keepalive:
-            self.ping()
+        self._ping_if_due()
 
         # Convert topic to bytes if it's not already
         if isinstance(topic, str):
@@ -456,27 +781,52 @@ class MQTTClient:
         # Generate packet ID
         pid = self._generate_packet_id()
 
-        # Construct SUBSCRIBE packet
-        payload = bytearray(struct.pack("!H", pid))
-        payload.extend(self._encode_string(topic))
-        payload.append(qos)
+        # Construct SUBSCRIBE packet in one join instead of growing a bytearray
+        payload = b"".join(
+            (_u16_pack(pid), _u16_pack(len(topic)), topic, bytes((qos,)))
+        )
 
         # Send SUBSCRIBE packet
         self._send_packet(SUBSCRIBE | 0x02, payload)
 
         # Wait for SUBACK
-        packet_type, payload = self._recv_packet()
+        packet_type, payload = self._recv_reply()
         if packet_type is None:
             # Timeout occurred, log the issue but don't crash
-            print("Warning: Timeout waiting for SUBACK")
+            if _DEBUG:
+                print("Warning: Timeout waiting for SUBACK")
+            return False
         elif packet_type != SUBACK:
             raise MQTTException(f"No SUBACK received: {packet_type}")
+        if len(payload) < 3 or payload[2] == 0x80:
+            # Return code 0x80 means the broker refused the subscription
+            if _DEBUG:
+                print("Warning: Subscription refused by broker")
+            return False
+
+        # Store subscription, keeping the topic as bytes
+        if topic in self._sub_topics:
+            self._sub_qos[self._sub_topics.index(topic)] = qos
+        else:
+            self._sub_topics.append(topic)
+            self._sub_qos.append(qos)
+
+        return True
+
+    def get_subscriptions(self):
+        """
+        Get the subscribed topics and their QoS.
 
-        # Store subscription
-        topic_str = topic.decode("utf-8") if isinstance(topic, bytes) else topic
-        self.subscriptions[topic_str] = qos
+        The dict is built on each call from the stored topics; changing it
+        does not change the subscriptions.
 
-        return
+        Returns:
+            dict: QoS by topic (str)
+        """
+        return {
+            topic.decode("utf-8"): qos
+            for topic, qos in zip(self._sub_topics, self._sub_qos)
+        }
 
     def set_callback(self, callback):
         """
@@ -489,6 +839,21 @@ class MQTTClient:
         """
         self.callback = callback
 
+    def _msg_pending(self):
+        """
+        Check without blocking whether data is waiting on the socket.
+
+        Returns:
+            bool: True if data (or a closed connection) is waiting to be read
+        """
+        # TLS may hold already decrypted data that poll cannot see
+        if self.ssl and getattr(self.sock, "pending", None) and self.sock.pending():
+            return True
+        if self._poller is None:
+            self._poller = select.poll()
+            self._poller.register(self.sock, select.POLLIN)
+        return bool(self._poller.poll(0))
+
     def check_msg(self):
         """
         Check for pending messages from the broker.
@@ -500,77 +865,95 @@ class MQTTClient:
             return
 
         # Check if we need to ping to keep connection alive
-        if self.keepalive > 0 and time.time() - self.last_ping >= self.keepalive:
-            self.ping()
+        self._ping_if_due()
+
+        # Return right away when nothing is waiting on the socket
+        if self._msg_pending():
+            self._process_msg()
 
-        # Try to receive a packet with a short timeout
+    def _process_msg(self):
+        """
+        Read one pending packet and handle it.
+
+        Returns:
+            bool: False if no packet could be read (timeout or closed connection)
+        """
+        # A packet has started to arrive, allow a short timeout for the rest
         packet_type, payload = self._recv_packet(timeout=0.5)
 
         if packet_type is None:
+            return False
+
+        self._handle_packet(packet_type, payload)
+        return True
+
+    def _handle_packet(self, packet_type, payload):
+        """
+        Handle a received packet.
+
+        PUBLISH packets are acknowledged and passed to the callback, a
+        PINGRESP clears the outstanding ping, and anything else is ignored.
+
+        Args:
+            packet_type (int): The first byte of the packet
+            payload (bytes): The packet payload
+        """
+        if packet_type & 0xF0 != PUBLISH:
+            if packet_type == PINGRESP:
+                self._ping_sent = None
             return
 
-        try:
-            if packet_type & 0xF0 == PUBLISH:
-                # Extract flags
-                dup = (packet_type & 0x08) >> 3
-                qos = (packet_type & 0x06) >> 1
-                retain = packet_type & 0x01
-
-                # Ensure payload is long enough for topic length
-                if len(payload) < 2:
+        # Lengths are validated up front, so only the PUBACK send and the
+        # callback need exception handlers
+        qos = (packet_type & 0x06) >> 1
+        payload_len = len(payload)
+
+        # Ensure payload is long enough for topic length
+        if payload_len < 2:
+            if _DEBUG:
+                print(
+                    "Warning: Malformed PUBLISH packet (payload too short for topic length)"
+                )
+            return
+
+        # Extract topic length
+        topic_len = (payload[0] << 8) | payload[1]
+        msg_offset = 2 + topic_len
+
+        # Ensure payload is long enough for topic
+        if payload_len < msg_offset:
+            if _DEBUG:
+                print("Warning: Malformed PUBLISH packet (payload too short for topic)")
+            return
+
+        # Extract packet ID for QoS > 0
+        if qos > 0:
+            # Ensure payload is long enough for packet ID
+            if payload_len < msg_offset + 2:
+                if _DEBUG:
                     print(
-                        "Warning: Malformed PUBLISH packet (payload too short for topic length)"
+                        "Warning: Malformed PUBLISH packet (payload too short for packet ID)"
                     )
-                    return
+                return
 
-                try:
-                    # Extract topic
-                    topic_len = struct.unpack("!H", payload[0:2])[0]
+            pid = (payload[msg_offset] << 8) | payload[msg_offset + 1]
+            msg_offset += 2
 
-                    # Ensure payload is long enough for topic
-                    if len(payload) < 2 + topic_len:
-                        print(
-                            "Warning: Malformed PUBLISH packet (payload too short for topic)"
-                        )
-                        return
-
-                    topic = payload[2 : 2 + topic_len]
-
-                    # Extract packet ID for QoS > 0
-                    if qos > 0:
-                        # Ensure payload is long enough for packet ID
-                        if len(payload) < 2 + topic_len + 2:
-                            print(
-                                "Warning: Malformed PUBLISH packet (payload too short for packet ID)"
-                            )
-                            return
-
-                        pid = struct.unpack(
-                            "!H", payload[2 + topic_len : 2 + topic_len + 2]
-                        )[0]
-                        message = payload[2 + topic_len + 2 :]
-
-                        # Send PUBACK for QoS 1
-                        if qos == 1:
-                            try:
-                                self._send_packet(PUBACK, struct.pack("!H", pid))
-                            except Exception as e:
-                                print(f"Warning: Failed to send PUBACK: {e}")
-                    else:
-                        message = payload[2 + topic_len :]
-
-                    # Call the callback if set
-                    if self.callback:
-                        try:
-                            # Convert bytearrays to bytes to ensure they are hashable
-                            self.callback(bytes(topic), bytes(message))
-                        except Exception as e:
-                            print(f"Warning: Callback error: {e}")
-                except struct.error as e:
-                    print(f"Warning: Failed to unpack PUBLISH packet: {e}")
+            # Send PUBACK for QoS 1
+            if qos == 1:
+                try:
+                    self._send_raw(_PUBACK_HEADER + _u16_pack(pid))
                 except Exception as e:
-                    print(f"Warning: Error processing PUBLISH packet: {e}")
-        except Exception as e:
-            print(f"Warning: Unexpected error in check_msg: {e}")
+                    if _DEBUG:
+                        print(f"Warning: Failed to send PUBACK: {e}")
 
-        return
+        # Call the callback if set
+        if self.callback:
+            try:
+                # Slice a view so topic and message are copied only
+                # once, into the hashable bytes the callback expects
+                view = memoryview(payload)
+                self.callback(bytes(view[2 : 2 + topic_len]), bytes(view[msg_offset:]))
+            except Exception as e:
+                # A failing callback is a programming error, always report it
+                print(f"Warning: Callback error: {e}")
@@ -1,5 +1,8 @@
 """
 OLED display module for ESP32 using SSD1306 controller.
+
+The module runs on MicroPython, so it must stay plain Python without NumPy,
+Numba or Cython.
 """
 
 LINE_HEIGHT = 8  # Height of each line in pixels
@@ -16,6 +19,18 @@ try:
 except ImportError:
     SIMULATION = True
 
+try:
+    from micropython import const
+except ImportError:
+
+    def const(value):
+        return value
+
+
+# Enables initialization diagnostics. As a const, MicroPython strips the
+# guarded print() calls at compile time.
+_DEBUG = const(0)
+
 from .sensor import Sensor
 from .config import get_display_config
 
@@ -74,36 +89,47 @@ class OLEDDisplay(Sensor):
             on_time if on_time is not None else display_config.get("on_time", 5)
         )
 
-        # Handle address (could be string in config)
+        # get_display_config already parses hex string addresses
         if address is None:
-            address = display_config.get("address", "0x3C")
+            address = display_config.get("address", 0x3C)
 
-        # Convert address to int if it's a hex string
+        # Still accept a hex string from a hand-built config dict
         if isinstance(address, str) and address.startswith("0x"):
             self.address = int(address, 16)
         else:
             self.address = address
 
-        self._values = []
+        self._values_count = 0  # Number of values shown by display_values
+        # Text currently drawn on each line, so unchanged lines are not redrawn
+        self._lines = {}
+        # (first, last) line with changes not yet sent to the screen, or None
+        self._dirty = None
+        # Text last drawn by display_values, to skip identical refreshes
+        self._shown_values = None
+        # Reused page addressing command stream for partial flushes
+        self._page_cmd = bytearray((0x00, 0x21, 0, 0, 0x22, 0, 0))
 
         # Initialize the display if not in simulation mode
         if not SIMULATION:
             try:
-                print("Initializing OLED display...")
-                print(f"  SCL pin: {self.scl_pin}, SDA pin: {self.sda_pin}")
+                if _DEBUG:
+                    print("Initializing OLED display...")
+                    print(f"  SCL pin: {self.scl_pin}, SDA pin: {self.sda_pin}")
                 # print('initializing scl pin', type(self.scl_pin), self.scl_pin)
                 scl = Pin(self.scl_pin)
                 # print('initializing sda pin', type(self.sda_pin), self.sda_pin)
                 sda = Pin(self.sda_pin)
                 # print('initializing i2c')
                 i2c = I2C(scl=scl, sda=sda)
-                print(f"  I2C bus: {i2c}")
-                # print('i2c scan:', i2c.scan())
-                print(f"  I2C address: {self.address}")
+                if _DEBUG:
+                    print(f"  I2C bus: {i2c}")
+                    # print('i2c scan:', i2c.scan())
+                    print(f"  I2C address: {self.address}")
                 self._display = ssd1306.SSD1306_I2C(
                     self.width, self.height, i2c, addr=self.address
                 )
-                print(f"  Display initialized: {self._display}")
+                if _DEBUG:
+                    print(f"  Display initialized: {self._display}")
                 self._display.fill(0)  # Clear the display
                 self._display.text("Initialized", 0, 0, 1)
                 self._display.show()
@@ -115,7 +141,64 @@ class OLEDDisplay(Sensor):
             print(f"Simulated OLED display initialized: {width}x{height}")
             self._display = None
 
+        # With a working display, bind the hardware variants once so the
+        # refresh path skips the SIMULATION and display checks on every call
+        if self._display:
+            self.clear = self._clear_hw
+            self.display_text = self._display_text_hw
+            self.set_line_text = self._set_line_text_hw
+            self.display_values = self._display_values_hw
+
     # region basic display methods
+    def show(self):
+        """
+        Send the changed lines of the framebuffer to the screen.
+
+        A text line is exactly one 8 pixel SSD1306 page, so only the pages
+        between the first and last changed line are transferred.
+        """
+        if SIMULATION or not self._display or self._dirty is None:
+            return
+        first, last = self._dirty
+        self._dirty = None
+        display = self._display
+        if last - first + 1 >= self.height // LINE_HEIGHT or not hasattr(
+            display, "write_data"
+        ):
+            display.show()
+            return
+        # Same addressing as ssd1306.show(), limited to the dirty pages;
+        # narrow displays use centred columns
+        x0 = (128 - self.width) // 2
+        commands = self._page_cmd
+        commands[2] = x0
+        commands[3] = x0 + self.width - 1
+        commands[5] = first
+        commands[6] = last
+        i2c = getattr(display, "i2c", None)
+        if i2c is not None:
+            # Control byte 0x00 (Co=0, D/C#=0) makes the rest of the write a
+            # command stream: one I2C transaction instead of one per command
+            i2c.writeto(display.addr, commands)
+        else:
+            for cmd in commands[1:]:
+                display.write_cmd(cmd)
+        display.write_data(
+            memoryview(display.buffer)[first * self.width : (last + 1) * self.width]
+        )
+
+    def _mark_dirty(self, line):
+        """
+        Record that a line has changed and needs to be sent on the next show().
+
+        Args:
+            line: Line index
+        """
+        if self._dirty is None:
+            self._dirty = (line, line)
+        else:
+            self._dirty = (min(self._dirty[0], line), max(self._dirty[1], line))
+
     def power_off(self):
         """
         Turn off the display to save power.
@@ -142,10 +225,18 @@ class OLEDDisplay(Sensor):
         """
         if SIMULATION:
             print("Simulated OLED display cleared")
-        else:
-            if self._display:
-                self._display.fill(0)
-                self._display.show()
+        elif self._display:
+            self._clear_hw()
+
+    def _clear_hw(self):
+        """
+        Clear the hardware display.
+        """
+        self._display.fill(0)
+        self._display.show()
+        self._lines.clear()
+        self._shown_values = None
+        self._dirty = None
 
     def display_text(self, text: str, x: int = 0, y: int = 0, color: int = 1):
         """
@@ -159,25 +250,69 @@ class OLEDDisplay(Sensor):
         """
         if SIMULATION:
             print(f"Simulated OLED display text at ({x}, {y}): {text}")
-        else:
-            if self._display:
-                self._display.text(text, x, y, color)
-                self._display.show()
+        elif self._display:
+            self._display_text_hw(text, x, y, color)
+
+    def _display_text_hw(self, text: str, x: int = 0, y: int = 0, color: int = 1):
+        """
+        Display text at the specified position on the hardware display.
 
-    def set_line_text(self, i, value):
+        Args:
+            text: The text to display
+            x: X coordinate (default: 0)
+            y: Y coordinate (default: 0)
+            color: Pixel color (1 for white, 0 for black, default: 1)
+        """
+        self._display.text(text, x, y, color)
+        self._display.show()
+        self._dirty = None
+        # Free text may overlap any line, so redraw lines on next update
+        self._lines.clear()
+        self._shown_values = None
+
+    def set_line_text(self, i, value) -> bool:
+        """
+        Draw a value on a line, unless the line already shows the same text.
+
+        Only the framebuffer is updated; call show() to send it to the screen.
+
+        Args:
+            i: Line index
+            value: The value to display (string or object with __str__ method)
+
+        Returns:
+            True if the line was redrawn, False if it was unchanged
+        """
         if SIMULATION:
             print(f"Simulated OLED display line {i}: {value}")
-        else:
-            if self._display:
-                y = i * LINE_HEIGHT
-                if y < self.height:  # Make sure we don't go off the screen
-                    x = 0
-                    self._display.fill_rect(
-                        x, y, self.width, LINE_HEIGHT, 0
-                    )  # Clear the line
-                    self._display.text(str(value), x, y, 1)
-                else:
-                    print(f"Line {i} exceeds display height, skipping")
+            return True
+        elif self._display:
+            return self._set_line_text_hw(i, value)
+        return False
+
+    def _set_line_text_hw(self, i, value) -> bool:
+        """
+        Draw a value on a line of the hardware display, unless it is unchanged.
+
+        Args:
+            i: Line index
+            value: The value to display (string or object with __str__ method)
+
+        Returns:
+            True if the line was redrawn, False if it was unchanged
+        """
+        text = str(value)
+        if self._lines.get(i) == text:
+            return False
+        y = i * LINE_HEIGHT
+        if y < self.height:  # Make sure we don't go off the screen
+            self._display.fill_rect(0, y, self.width, LINE_HEIGHT, 0)  # Clear the line
+            self._display.text(text, 0, y, 1)
+            self._lines[i] = text
+            self._mark_dirty(i)
+            return True
+        print(f"Line {i} exceeds display height, skipping")
+        return False
 
     # endregion
 
@@ -190,30 +325,57 @@ class OLEDDisplay(Sensor):
         Args:
             values: List of values to display (strings or objects with __str__ method)
         """
-        self._values = values
+        self._values_count = len(values)
 
         if SIMULATION:
             print("Simulated OLED display values:")
             for i, value in enumerate(values):
                 print(f"  Line {i}: {value}")
-        else:
-            if self._display:
-                # self._display.fill(0)  # Clear the display
-                x = 0
-                y = VALUE_LINES_START * LINE_HEIGHT
-                self._display.fill_rect(
-                    x, y, self.width, self.height - y, 0
-                )  # Clear the line
-                # Display each value on a new line (8 pixels per line)
-                for i, value in enumerate(values):
-                    self.set_line_text(VALUE_LINES_START + i, value)
+        elif self._display:
+            self._display_values_hw(values)
 
-                self._display.show()
+    def _display_values_hw(self, values: list):
+        """
+        Display a list of values on the hardware display.
+
+        Args:
+            values: List of values to display (strings or objects with __str__ method)
+        """
+        self._values_count = len(values)
+
+        # Convert the values that fit on the screen (8 pixels per line) once;
+        # the same strings serve the change check and the drawing
+        max_lines = self.height // LINE_HEIGHT - VALUE_LINES_START
+        shown = tuple([str(value) for value in values[:max_lines]])
+
+        # Nothing to draw for the same text as last time, but still send
+        # lines changed elsewhere, such as a new header
+        if shown == self._shown_values:
+            self.show()
+            return
+        self._shown_values = shown
+
+        set_line_text = self._set_line_text_hw
+        for line, text in enumerate(shown, VALUE_LINES_START):
+            set_line_text(line, text)
+
+        # Clear value lines left over from a longer previous list
+        end = VALUE_LINES_START + len(shown)
+        for line in [line for line in self._lines if line >= end]:
+            self._display.fill_rect(0, line * LINE_HEIGHT, self.width, LINE_HEIGHT, 0)
+            del self._lines[line]
+            self._mark_dirty(line)
+
+        # Send all changed lines in a single I2C transfer
+        self.show()
 
     def set_header(self, value):
         """
         Display a header on the OLED screen.
 
+        Only the framebuffer is updated; the header appears on the next
+        show(), set_status() or display_values() call.
+
         Args:
             value: The header to display
         """
@@ -227,8 +389,7 @@ class OLEDDisplay(Sensor):
             status: The status message to display
         """
         self.set_line_text(STATUS_LINE, status)
-        if self._display:
-            self._display.show()
+        self.show()
 
     # endregion
 
@@ -258,7 +419,7 @@ class OLEDDisplay(Sensor):
         metadata["height"] = self.height
         metadata["address"] = self.address
         metadata["type"] = "SSD1306"
-        metadata["values_count"] = len(self._values)
+        metadata["values_count"] = self._values_count
         return metadata
 
     # endregion
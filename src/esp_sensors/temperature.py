@@ -82,7 +82,7 @@ class TemperatureSensor(Sensor):
         """
         if self.unit == "F" or self._last_reading is None:
             return self._last_reading
-        return (self._last_reading * 9 / 5) + 32
+        return self._last_reading * 1.8 + 32
 
     def to_celsius(self) -> float | None:
         """
@@ -93,4 +93,4 @@ class TemperatureSensor(Sensor):
         """
         if self.unit == "C" or self._last_reading is None:
             return self._last_reading
-        return (self._last_reading - 32) * 5 / 9
+        return (self._last_reading - 32) / 1.8
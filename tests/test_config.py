@@ -61,3 +61,13 @@ def test_get_display_config():
     # Get configuration for a non-existent display (should return default or empty dict)
     non_existent_config = get_display_config("non_existent", test_config)
     assert isinstance(non_existent_config, dict)
+
+
+def test_get_display_config_parses_address():
+    """Test that a hex string I2C address is returned as an int."""
+    test_config = {"displays": {"oled": {"address": "0x3D"}}}
+
+    display_config = get_display_config("oled", test_config)
+    assert display_config["address"] == 0x3D
+    # The stored configuration is left untouched
+    assert test_config["displays"]["oled"]["address"] == "0x3D"
@@ -165,3 +165,22 @@ def test_check_config_update_esp32_no_version(mqtt_config, current_config):
     mock_client.read_topic.assert_called_once_with(
         mqtt_config["topic_config_version"], 5.0
     )
+
+
+def test_check_config_update_uses_encoded_topics(
+    mqtt_config, current_config, new_config
+):
+    """Test that check_config_update reads the pre-encoded topics set up by setup_mqtt."""
+    mqtt_config["_topic_config_version_b"] = b"test/config/version"
+    mqtt_config["_topic_config_data_b"] = b"test/config/data"
+    mock_client = MagicMock(spec=ESP32MQTTClient)
+    mock_client.read_topic.side_effect = [
+        str(new_config["version"]),
+        json.dumps(new_config),
+    ]
+
+    result = check_config_update(mock_client, mqtt_config, current_config)
+
+    assert result == new_config
+    mock_client.read_topic.assert_any_call(b"test/config/version", 5.0)
+    mock_client.read_topic.assert_any_call(b"test/config/data", 5.0)
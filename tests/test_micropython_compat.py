@@ -0,0 +1,34 @@
+"""
+Tests that the device modules only use imports available on MicroPython.
+"""
+
+import ast
+import os
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "esp_sensors")
+
+# Host-only packages that do not exist on the ESP32 firmware
+FORBIDDEN_MODULES = {"numpy", "numba", "cython", "Cython"}
+
+
+@pytest.mark.parametrize(
+    "filename", sorted(f for f in os.listdir(SRC_DIR) if f.endswith(".py"))
+)
+def test_no_host_only_imports(filename):
+    """Test that a device module does not import NumPy, Numba or Cython."""
+    with open(os.path.join(SRC_DIR, filename)) as f:
+        tree = ast.parse(f.read(), filename)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            assert (
+                name.split(".")[0] not in FORBIDDEN_MODULES
+            ), f"{filename} imports {name}"
@@ -3,11 +3,14 @@ Tests for the MQTT module.
 """
 
 import json
+import socket
+import time
 from unittest.mock import patch, MagicMock
 
 import pytest
 
-from src.esp_sensors.mqtt import setup_mqtt, publish_sensor_data
+from src.esp_sensors import mqtt
+from src.esp_sensors.mqtt import setup_mqtt, publish_sensor_data, ESP32MQTTClient
 
 
 class TestSensor:
@@ -20,6 +23,16 @@ class TestSensor:
         self.unit = temperature_unit
 
 
+@pytest.fixture(autouse=True)
+def reset_mqtt_caches():
+    """Fixture clearing the module-level topic and delta caches between tests."""
+    mqtt._last_published.clear()
+    mqtt._data_topics.clear()
+    yield
+    mqtt._last_published.clear()
+    mqtt._data_topics.clear()
+
+
 @pytest.fixture
 def mqtt_config():
     """Fixture providing a sample MQTT configuration."""
@@ -130,7 +143,7 @@ def test_publish_sensor_data_success(mqtt_config, mock_sensor):
     # mock_client.publish.assert_any_call(humidity_topic, str(humidity).encode())
 
     # Verify publish was called for combined data
-    data_topic = f"{mqtt_config['topic_data_prefix']}/{mock_sensor.name.lower().replace(' ', '_')}/data"
+    data_topic = f"{mqtt_config['topic_data_prefix']}/{mock_sensor.name.lower().replace(' ', '_')}/data".encode()
     # Check that the JSON data was published
     for call_args in mock_client.publish.call_args_list:
         if call_args[0][0] == data_topic:
@@ -145,6 +158,128 @@ def test_publish_sensor_data_success(mqtt_config, mock_sensor):
         pytest.fail("Data topic was not published")
 
 
+def test_publish_sensor_data_uses_sensor_id(mqtt_config, mock_sensor):
+    """Test that publish_sensor_data prefers the sensor id and emits valid JSON."""
+    mock_client = MagicMock()
+    mock_sensor.id = "living-room-dht22"
+
+    result = publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.25, None)
+
+    assert result is True
+    topic, payload = mock_client.publish.call_args[0]
+    assert mock_client.publish.call_args[1] == {"retain": False}
+    assert topic == b"test/sensors/living-room-dht22/data"
+    assert b'"temperature":21.25,' in payload
+    data = json.loads(payload)
+    assert data["temperature"] == 21.25
+    assert data["humidity"] is None
+    assert data["unit"] == "C"
+
+
+def test_publish_sensor_data_topic_follows_id_change(mqtt_config, mock_sensor):
+    """Test that cached topics follow a changed sensor id and stay bounded."""
+    mock_client = MagicMock()
+    mock_sensor.id = "first"
+    publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.0, 40.0)
+    mock_sensor.id = "second"
+    publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.0, 40.0)
+    assert mock_client.publish.call_args[0][0] == b"test/sensors/second/data"
+
+    for i in range(100):
+        mock_sensor.id = f"sensor_{i}"
+        publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.0, 40.0)
+    assert len(mqtt._data_topics) <= mqtt._CACHE_SIZE
+
+
+def test_publish_sensor_data_binary(mqtt_config, mock_sensor):
+    """Test that publish_sensor_data emits CBOR when binary payloads are enabled."""
+    mock_client = MagicMock()
+    mqtt_config["binary"] = True
+
+    with patch("time.time", return_value=300):
+        result = publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.5, 55.25)
+
+    assert result is True
+    topic, payload = mock_client.publish.call_args[0]
+    assert topic == b"test/sensors/dht22_sensor/data.cbor"
+    assert payload == (
+        b"\xa4"
+        b"\x6btemperature\xfa\x41\xac\x00\x00"
+        b"\x68humidity\xfa\x42\x5d\x00\x00"
+        b"\x66uptime\x19\x01\x2c"
+        b"\x64unit\x61C"
+    )
+
+
+def test_publish_sensor_data_split_topics(mqtt_config, mock_sensor):
+    """Test that split_topics batches the single readings with the data message."""
+    mock_client = MagicMock()
+    mqtt_config["split_topics"] = True
+
+    result = publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.5, None)
+
+    assert result is True
+    mock_client.publish.assert_not_called()
+    messages = mock_client.publish_many.call_args[0][0]
+    assert [topic for topic, _ in messages] == [
+        b"test/sensors/dht22_sensor/data",
+        b"test/sensors/dht22_sensor/temperature",
+    ]
+    assert messages[1][1] == b"21.50"
+
+
+def test_publish_sensor_data_skips_unchanged(mqtt_config, mock_sensor):
+    """Test that unchanged readings are skipped until the heartbeat is due."""
+    mock_client = MagicMock()
+    mqtt_config["publish_epsilon"] = 0.1
+    mqtt_config["publish_heartbeat"] = 3
+
+    for temperature in (21.5, 21.55, 21.52, 21.5, 22.0):
+        assert publish_sensor_data(
+            mock_client, mqtt_config, mock_sensor, temperature, 55.0
+        )
+
+    # First publish, two skipped cycles, heartbeat, then a real change
+    assert mock_client.publish.call_count == 3
+
+
+def test_publish_sensor_data_skips_unchanged_after_deep_sleep(
+    mqtt_config, mock_sensor, monkeypatch
+):
+    """Test that the last published readings survive a reboot in RTC memory."""
+
+    class FakeRTC:
+        data = b""
+
+        def memory(self, data=None):
+            if data is None:
+                return FakeRTC.data
+            FakeRTC.data = data
+
+    monkeypatch.setattr(mqtt, "RTC", FakeRTC)
+    mock_client = MagicMock()
+    mqtt_config["publish_epsilon"] = 0.1
+
+    publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.5, 55.0)
+    assert FakeRTC.data
+
+    # Deep sleep wipes RAM; the state is restored at import time
+    monkeypatch.setattr(mqtt, "_last_published", mqtt._load_last_published())
+    publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.55, 55.0)
+    assert mock_client.publish.call_count == 1
+
+
+def test_publish_sensor_data_escapes_unit(mqtt_config, mock_sensor):
+    """Test that units needing escaping still produce valid JSON."""
+    mock_client = MagicMock()
+    mock_sensor.unit = 'deg "C"'
+
+    publish_sensor_data(mock_client, mqtt_config, mock_sensor, 21.5, 55.0)
+
+    payload = mock_client.publish.call_args[0][1]
+    assert json.loads(payload)["unit"] == 'deg "C"'
+
+
 def test_publish_sensor_data_no_client(mqtt_config, mock_sensor):
     """Test that publish_sensor_data returns False when client is None."""
     result = publish_sensor_data(None, mqtt_config, mock_sensor, 25.5, 60.0)
@@ -162,3 +297,122 @@ def test_publish_sensor_data_error(mqtt_config, mock_sensor):
 
     # Verify the result
     assert result is False
+
+
+@pytest.fixture
+def socket_pair():
+    """Fixture providing a connected pair of sockets."""
+    local, remote = socket.socketpair()
+    yield local, remote
+    local.close()
+    remote.close()
+
+
+def test_read_topic_returns_when_message_arrives(socket_pair):
+    """Test that read_topic returns as soon as a message is available."""
+    local, remote = socket_pair
+    client = ESP32MQTTClient("test_client", "test.mosquitto.org")
+    client.connected = True
+    client.client = MagicMock()
+    client.client.sock = local
+
+    def check_msg():
+        local.recv(1)
+        client._message_callback(b"test/topic", b"payload")
+
+    client.client.check_msg.side_effect = check_msg
+    remote.send(b"\x00")
+
+    start = time.time()
+    result = client.read_topic("test/topic", wait_time=5.0)
+
+    assert result == b"payload"
+    assert time.time() - start < 1.0
+    client.client.check_msg.assert_called_once()
+
+
+def test_read_topic_timeout(socket_pair):
+    """Test that read_topic returns None when no message arrives in time."""
+    local, _ = socket_pair
+    client = ESP32MQTTClient("test_client", "test.mosquitto.org")
+    client.connected = True
+    client.client = MagicMock()
+    client.client.sock = local
+
+    result = client.read_topic("test/topic", wait_time=0.1)
+
+    assert result is None
+    client.client.check_msg.assert_not_called()
+
+
+def test_message_callback_ignores_other_topics():
+    """Test that only the message for the awaited topic is kept."""
+    client = ESP32MQTTClient("test_client", "test.mosquitto.org")
+    client._await_topic = b"test/topic"
+
+    client._message_callback(b"other/topic", b"ignored")
+    assert client._await_msg is None
+
+    client._message_callback(b"test/topic", b"payload")
+    assert client._await_msg == b"payload"
+
+
+def test_read_topic_reuses_poller_until_disconnect(socket_pair):
+    """Test that the socket is registered once and released on disconnect."""
+    local, _ = socket_pair
+    client = ESP32MQTTClient("test_client", "test.mosquitto.org")
+    client.connected = True
+    client.client = MagicMock()
+    client.client.sock = local
+
+    client.read_topic("test/topic", wait_time=0.01)
+    poller = client._poller
+    assert poller is not None
+
+    client.read_topic("test/topic", wait_time=0.01)
+    assert client._poller is poller
+    # The topic is only subscribed once per session
+    client.client.subscribe.assert_called_once_with(b"test/topic", 0)
+
+    client.disconnect()
+    assert client._poller is None
+    assert client._subscribed == {}
+    client.client.disconnect.assert_called_once()
+
+
+def test_read_topic_repeats_last_message(socket_pair):
+    """Test that a repeated read returns the message the subscribe delivered."""
+    local, remote = socket_pair
+    client = ESP32MQTTClient("test_client", "test.mosquitto.org")
+    client.connected = True
+    client.client = MagicMock()
+    client.client.sock = local
+
+    def check_msg():
+        local.recv(1)
+        client._message_callback(b"test/topic", b"retained")
+
+    client.client.check_msg.side_effect = check_msg
+    remote.send(b"\x00")
+    assert client.read_topic("test/topic", wait_time=1.0) == b"retained"
+
+    # No new subscribe, so the broker does not resend the retained message
+    start = time.time()
+    assert client.read_topic("test/topic", wait_time=5.0) == b"retained"
+    assert time.time() - start < 1.0
+    client.client.subscribe.assert_called_once()
+
+
+def test_subscribe_unconfirmed_is_retried():
+    """Test that a subscription without SUBACK is not recorded."""
+    client = ESP32MQTTClient("test_client", "test.mosquitto.org")
+    client.connected = True
+    client.client = MagicMock()
+    client.client.subscribe.return_value = False
+
+    assert client.subscribe("test/topic") is False
+    assert b"test/topic" not in client._subscribed
+
+    client.client.subscribe.return_value = True
+    assert client.subscribe("test/topic") is True
+    assert b"test/topic" in client._subscribed
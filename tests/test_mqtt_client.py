@@ -4,8 +4,8 @@ Tests for the MQTT Client module.
 This module contains tests for the MQTTClient class in the mqtt_client.py module.
 """
 
+import socket
 import struct
-import time
 from unittest.mock import patch, MagicMock
 
 import pytest
@@ -16,6 +16,7 @@ from src.esp_sensors.mqtt_client import (
     CONNACK,
     PUBLISH,
     PUBACK,
+    PINGRESP,
     SUBACK,
 )
 
@@ -49,8 +50,8 @@ class TestMQTTClient:
         assert mqtt_client.connected is False
         assert mqtt_client.callback is None
         assert mqtt_client.pid == 0
-        assert mqtt_client.subscriptions == {}
-        assert mqtt_client.last_ping == 0
+        assert mqtt_client.get_subscriptions() == {}
+        assert mqtt_client.next_ping is None
 
     def test_generate_packet_id(self, mqtt_client):
         """Test that _generate_packet_id returns sequential IDs and wraps around."""
@@ -65,9 +66,9 @@ class TestMQTTClient:
         # Set pid to 65535 (max value)
         mqtt_client.pid = 65535
 
-        # Next call should wrap around to 0
-        assert mqtt_client._generate_packet_id() == 0
-        assert mqtt_client.pid == 0
+        # Next call should wrap around to 1, as 0 is not a valid packet ID
+        assert mqtt_client._generate_packet_id() == 1
+        assert mqtt_client.pid == 1
 
     def test_encode_length(self, mqtt_client):
         """Test that _encode_length correctly encodes MQTT remaining length."""
@@ -81,6 +82,10 @@ class TestMQTTClient:
         # Test large length (16384-2097151)
         assert list(mqtt_client._encode_length(2097151)) == [0xFF, 0xFF, 0x7F]
 
+        # Test maximum length (2097152-268435455)
+        assert list(mqtt_client._encode_length(2097152)) == [0x80, 0x80, 0x80, 0x01]
+        assert list(mqtt_client._encode_length(268435455)) == [0xFF, 0xFF, 0xFF, 0x7F]
+
     def test_encode_string(self, mqtt_client):
         """Test that _encode_string correctly encodes strings for MQTT packets."""
         # Test with string input
@@ -113,14 +118,61 @@ class TestMQTTClient:
             mock_socket.assert_called_once()
             mock_sock.connect.assert_called_once_with(("test.mosquitto.org", 1883))
 
+            # Verify Nagle's algorithm was disabled
+            mock_sock.setsockopt.assert_any_call(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+            )
+            # Dead connections are detected through TCP keepalive
+            mock_sock.setsockopt.assert_any_call(
+                socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1
+            )
+
             # Verify CONNECT packet was sent
-            mock_sock.send.assert_called_once()
+            mock_sock.sendall.assert_called_once()
+            connect_packet = mock_sock.sendall.call_args[0][0]
 
             # Verify result
             assert result == 0
             assert mqtt_client.connected is True
             assert mqtt_client.sock is mock_sock
 
+            # A reconnect sends the same cached CONNECT payload
+            mock_sock.reset_mock()
+            with patch.object(mqtt_client, "_encode_string") as encode_string:
+                assert mqtt_client.connect() == 0
+                encode_string.assert_not_called()
+            assert mock_sock.sendall.call_args[0][0] == connect_packet
+
+    @patch("ssl.create_default_context")
+    @patch("socket.socket")
+    def test_connect_tls_resumes_session(
+        self, mock_socket, mock_create_context, mqtt_client
+    ):
+        """Test that TLS reconnects offer the previous session for resumption."""
+        mqtt_client.ssl = True
+        mock_ctx = mock_create_context.return_value
+        tls_sock = mock_ctx.wrap_socket.return_value
+
+        with (
+            patch.object(
+                mqtt_client, "_recv_packet", return_value=(CONNACK, b"\x00\x00")
+            ),
+            patch.object(MQTTClient, "_ssl_ctx", None),
+        ):
+            assert mqtt_client.connect() == 0
+            mock_ctx.wrap_socket.assert_called_once_with(
+                mock_socket.return_value,
+                server_hostname="test.mosquitto.org",
+                session=None,
+            )
+            assert mqtt_client.sock is tls_sock
+
+            assert mqtt_client.connect() == 0
+            assert mock_ctx.wrap_socket.call_args[1]["session"] is tls_sock.session
+
+        # The context is created once and shared
+        mock_create_context.assert_called_once()
+
     @patch("socket.socket")
     def test_connect_timeout(self, mock_socket, mqtt_client):
         """Test connection with timeout."""
@@ -138,7 +190,7 @@ class TestMQTTClient:
             mock_sock.connect.assert_called_once_with(("test.mosquitto.org", 1883))
 
             # Verify CONNECT packet was sent
-            mock_sock.send.assert_called_once()
+            mock_sock.sendall.assert_called_once()
 
             # Verify result indicates failure but doesn't crash
             assert result == 1
@@ -174,7 +226,7 @@ class TestMQTTClient:
         mqtt_client.disconnect()
 
         # Verify DISCONNECT packet was sent
-        mock_sock.send.assert_called_once()
+        mock_sock.sendall.assert_called_once_with(b"\xe0\x00")
 
         # Verify socket was closed
         mock_sock.close.assert_called_once()
@@ -193,19 +245,18 @@ class TestMQTTClient:
         # Set up the client as connected
         mqtt_client.sock = mock_sock
         mqtt_client.connected = True
-        # Set last_ping to current time to prevent ping from being triggered
-        mqtt_client.last_ping = time.time()
 
         # Call publish with QoS 0
         mqtt_client.publish("test/topic", "test message")
 
         # Verify PUBLISH packet was sent
-        mock_sock.send.assert_called_once()
+        mock_sock.sendall.assert_called_once()
+        assert bytes(mock_sock.sendall.call_args[0][0]) == (
+            bytes([PUBLISH, 24]) + b"\x00\x0atest/topictest message"
+        )
 
         # Test with QoS 1
         mock_sock.reset_mock()
-        # Reset last_ping to current time to prevent ping from being triggered
-        mqtt_client.last_ping = time.time()
 
         # Mock the _recv_packet method instead of directly mocking socket.recv
         with patch.object(
@@ -214,12 +265,13 @@ class TestMQTTClient:
             mqtt_client.publish("test/topic", "test message", qos=1)
 
             # Verify PUBLISH packet was sent
-            assert mock_sock.send.call_count == 1
+            assert mock_sock.sendall.call_count == 1
+            assert bytes(mock_sock.sendall.call_args[0][0]) == (
+                bytes([PUBLISH | 0x02, 26]) + b"\x00\x0atest/topic\x00\x01test message"
+            )
 
         # Test with QoS 1 and timeout
         mock_sock.reset_mock()
-        # Reset last_ping to current time to prevent ping from being triggered
-        mqtt_client.last_ping = time.time()
 
         # Mock _recv_packet to return None (simulating timeout)
         with patch.object(mqtt_client, "_recv_packet", return_value=(None, None)):
@@ -227,7 +279,180 @@ class TestMQTTClient:
             mqtt_client.publish("test/topic", "test message", qos=1)
 
             # Verify PUBLISH packet was still sent
-            assert mock_sock.send.call_count == 1
+            assert mock_sock.sendall.call_count == 1
+
+    def test_publish_raw(self, mqtt_client):
+        """Test that the bytes-only fast path sends the same packet as publish."""
+        mock_sock = MagicMock()
+        mqtt_client.sock = mock_sock
+        mqtt_client.connected = True
+
+        mqtt_client._publish_raw(b"test/topic", b"test message", retain=True)
+
+        mock_sock.sendall.assert_called_once()
+        assert bytes(mock_sock.sendall.call_args[0][0]) == (
+            bytes([PUBLISH | 0x01, 24]) + b"\x00\x0atest/topictest message"
+        )
+
+    @patch("socket.socket")
+    def test_publish_many(self, mock_socket, mqtt_client):
+        """Test that publish_many sends all PUBLISH packets in one write."""
+        # Configure the mock socket
+        mock_sock = MagicMock()
+        mock_socket.return_value = mock_sock
+
+        # Set up the client as connected
+        mqtt_client.sock = mock_sock
+        mqtt_client.connected = True
+
+        mqtt_client.publish_many([("a/t", b"21.5"), (b"a/h", "40")])
+
+        # Verify both packets were sent in a single call
+        mock_sock.sendall.assert_called_once()
+        sent = bytes(mock_sock.sendall.call_args[0][0])
+        assert sent == (
+            bytes([PUBLISH, 9])
+            + b"\x00\x03a/t21.5"
+            + bytes([PUBLISH, 7])
+            + b"\x00\x03a/h40"
+        )
+
+        # Retained messages set the retain flag on every packet
+        mock_sock.reset_mock()
+        mqtt_client.publish_many([("a/t", b"1")], retain=True)
+        assert bytes(mock_sock.sendall.call_args[0][0])[0] == PUBLISH | 0x01
+
+    def test_publish_many_qos1(self, mqtt_client):
+        """Test that publish_many sends QoS 1 messages first and then waits for PUBACKs."""
+        mock_sock = MagicMock()
+        mqtt_client.sock = mock_sock
+        mqtt_client.connected = True
+
+        with patch.object(
+            mqtt_client, "_recv_packet", return_value=(PUBACK, b"\x00\x01")
+        ) as recv_packet:
+            mqtt_client.publish_many(
+                [("a/t", b"1", 1), ("a/h", b"2"), ("a/p", b"3", 1)]
+            )
+
+        mock_sock.sendall.assert_called_once()
+        sent = bytes(mock_sock.sendall.call_args[0][0])
+        assert sent == (
+            bytes([PUBLISH | 0x02, 8])
+            + b"\x00\x03a/t\x00\x011"
+            + bytes([PUBLISH, 6])
+            + b"\x00\x03a/h2"
+            + bytes([PUBLISH | 0x02, 8])
+            + b"\x00\x03a/p\x00\x023"
+        )
+        assert recv_packet.call_count == 2
+
+    def test_publish_reuses_buffer(self, mqtt_client):
+        """Test that publish writes into the shared transmit buffer."""
+        mock_sock = MagicMock()
+        mqtt_client.sock = mock_sock
+        mqtt_client.connected = True
+
+        mqtt_client.publish(b"a/t", b"x" * 2000)
+
+        sent = mock_sock.sendall.call_args[0][0]
+        assert sent.obj is mqtt_client._tx_buf
+        assert bytes(sent[:8]) == bytes([PUBLISH, 2005 & 0x7F | 0x80, 2005 >> 7]) + (
+            b"\x00\x03a/t"
+        )
+        assert len(sent) == 3 + 2005
+
+        # Smaller messages keep using the grown buffer
+        mqtt_client.publish(b"a/t", b"1")
+        assert mock_sock.sendall.call_args[0][0].obj is sent.obj
+
+    def test_publish_many_grows_buffer(self, mqtt_client):
+        """Test that publish_many handles batches larger than its buffer."""
+        mock_sock = MagicMock()
+        mqtt_client.sock = mock_sock
+        mqtt_client.connected = True
+
+        message = b"x" * 2000
+        mqtt_client.publish_many([("a/t", message)])
+
+        sent = bytes(mock_sock.sendall.call_args[0][0])
+        # Fixed header: type + 2-byte remaining length (2 + 3 + 2000 = 2005)
+        assert sent[:3] == bytes([PUBLISH, 2005 & 0x7F | 0x80, 2005 >> 7])
+        assert sent[3:8] == b"\x00\x03a/t"
+        assert sent[8:] == message
+
+    def test_keepalive_ping(self, mqtt_client):
+        """Test that a PINGREQ is only sent once the keepalive deadline has passed."""
+        mqtt_client.sock = MagicMock()
+        mqtt_client.connected = True
+        mqtt_client._schedule_ping()
+
+        with patch.object(mqtt_client, "ping") as ping:
+            mqtt_client.publish("a/t", b"1")
+            ping.assert_not_called()
+
+            # Move the deadline into the past
+            mqtt_client.next_ping -= 60 * 1000 + 1
+            mqtt_client.publish("a/t", b"1")
+            ping.assert_called_once()
+
+    def test_ping_does_not_block(self, mqtt_client):
+        """Test that the PINGRESP is consumed later and a missing one disconnects."""
+        mock_sock = MagicMock()
+        mqtt_client.sock = mock_sock
+        mqtt_client.connected = True
+
+        with patch.object(mqtt_client, "_recv_packet") as recv_packet:
+            mqtt_client.ping()
+            mock_sock.sendall.assert_called_once_with(bytes([0xC0, 0]))
+            recv_packet.assert_not_called()
+            assert mqtt_client._ping_sent is not None
+
+            # check_msg consumes the PINGRESP
+            recv_packet.return_value = (PINGRESP, b"")
+            with patch.object(mqtt_client, "_msg_pending", return_value=True):
+                mqtt_client.check_msg()
+            assert mqtt_client._ping_sent is None
+
+        # No PINGRESP within half the keepalive interval
+        mqtt_client.ping()
+        mqtt_client._ping_sent -= mqtt_client.keepalive * 500 + 1
+        with patch.object(mqtt_client, "_msg_pending", return_value=False):
+            with pytest.raises(MQTTException):
+                mqtt_client.publish("a/t", b"1")
+        assert not mqtt_client.connected
+
+    def test_ping_without_keepalive(self):
+        """Test that an explicit ping with keepalive disabled does not disconnect."""
+        client = MQTTClient(
+            client_id="test_client", server="test.mosquitto.org", keepalive=0
+        )
+        client.sock = MagicMock()
+        client.connected = True
+
+        client.ping()
+        assert client._ping_sent is None
+        client.publish("a/t", b"1")
+        assert client.connected
+
+    def test_ping_unanswered_after_close(self, mqtt_client):
+        """Test that a broker closing the connection during a ping disconnects."""
+        local, remote = socket.socketpair()
+        try:
+            mqtt_client.sock = local
+            mqtt_client.connected = True
+
+            mqtt_client.ping()
+            assert remote.recv(2) == bytes([0xC0, 0])
+            remote.close()
+
+            # poll keeps reporting EOF as readable; this must not loop forever
+            mqtt_client._ping_sent -= mqtt_client.keepalive * 500 + 1
+            with pytest.raises(MQTTException):
+                mqtt_client.check_msg()
+            assert not mqtt_client.connected
+        finally:
+            local.close()
 
     @patch("socket.socket")
     def test_subscribe(self, mock_socket, mqtt_client):
@@ -239,38 +464,44 @@ class TestMQTTClient:
         # Set up the client as connected
         mqtt_client.sock = mock_sock
         mqtt_client.connected = True
-        # Set last_ping to current time to prevent ping from being triggered
-        mqtt_client.last_ping = time.time()
 
         # Mock the _recv_packet method to return a successful SUBACK
         with patch.object(
             mqtt_client, "_recv_packet", return_value=(SUBACK, b"\x00\x01\x00")
         ):
             # Call subscribe
-            mqtt_client.subscribe("test/topic")
+            assert mqtt_client.subscribe("test/topic") is True
 
             # Verify SUBSCRIBE packet was sent
-            mock_sock.send.assert_called_once()
+            mock_sock.sendall.assert_called_once()
+            assert bytes(mock_sock.sendall.call_args[0][0]) == (
+                bytes([0x82, 15]) + b"\x00\x01\x00\x0atest/topic\x00"
+            )
 
             # Verify subscription was stored
-            assert "test/topic" in mqtt_client.subscriptions
-            assert mqtt_client.subscriptions["test/topic"] == 0
+            assert "test/topic" in mqtt_client.get_subscriptions()
+            assert mqtt_client.get_subscriptions()["test/topic"] == 0
 
         # Test with timeout
         mock_sock.reset_mock()
-        # Reset last_ping to current time to prevent ping from being triggered
-        mqtt_client.last_ping = time.time()
 
         # Mock _recv_packet to return None (simulating timeout)
         with patch.object(mqtt_client, "_recv_packet", return_value=(None, None)):
-            # This should not raise an exception
-            mqtt_client.subscribe("test/timeout")
+            # This should not raise an exception, but report the failure
+            assert mqtt_client.subscribe("test/timeout") is False
 
             # Verify SUBSCRIBE packet was still sent
-            assert mock_sock.send.call_count == 1
+            assert mock_sock.sendall.call_count == 1
 
-            # Verify subscription was still stored
-            assert "test/timeout" in mqtt_client.subscriptions
+            # An unconfirmed subscription is not stored
+            assert "test/timeout" not in mqtt_client.get_subscriptions()
+
+        # Test with a refused subscription (return code 0x80)
+        with patch.object(
+            mqtt_client, "_recv_packet", return_value=(SUBACK, b"\x00\x03\x80")
+        ):
+            assert mqtt_client.subscribe("test/refused") is False
+            assert "test/refused" not in mqtt_client.get_subscriptions()
 
     @patch("socket.socket")
     def test_check_msg(self, mock_socket, mqtt_client):
@@ -282,8 +513,6 @@ class TestMQTTClient:
         # Set up the client as connected
         mqtt_client.sock = mock_sock
         mqtt_client.connected = True
-        # Set last_ping to current time to prevent ping from being triggered
-        mqtt_client.last_ping = time.time()
 
         # Set up a mock callback
         mock_callback = MagicMock()
@@ -296,13 +525,116 @@ class TestMQTTClient:
         payload = topic_encoded + message.encode()
 
         # Mock the _recv_packet method to return a PUBLISH packet
-        with patch.object(mqtt_client, "_recv_packet", return_value=(PUBLISH, payload)):
+        with (
+            patch.object(mqtt_client, "_recv_packet", return_value=(PUBLISH, payload)),
+            patch.object(mqtt_client, "_msg_pending", return_value=True),
+        ):
             # Call check_msg
             mqtt_client.check_msg()
 
             # Verify callback was called with correct parameters
             mock_callback.assert_called_once_with(topic.encode(), message.encode())
 
+    def test_check_msg_qos1(self, mqtt_client):
+        """Test that a QoS 1 message is acknowledged and passed on without its ID."""
+        mock_sock = MagicMock()
+        mqtt_client.sock = mock_sock
+        mqtt_client.connected = True
+        mock_callback = MagicMock()
+        mqtt_client.set_callback(mock_callback)
+
+        payload = bytearray(b"\x00\x03a/t\x00\x07hello")
+        with (
+            patch.object(
+                mqtt_client, "_recv_packet", return_value=(PUBLISH | 0x02, payload)
+            ),
+            patch.object(mqtt_client, "_msg_pending", return_value=True),
+        ):
+            mqtt_client.check_msg()
+
+        mock_callback.assert_called_once_with(b"a/t", b"hello")
+        assert bytes(mock_sock.sendall.call_args[0][0]) == bytes([PUBACK, 2, 0, 7])
+
+    def test_check_msg_malformed(self, mqtt_client):
+        """Test that malformed PUBLISH packets are dropped without raising."""
+        mqtt_client.sock = MagicMock()
+        mqtt_client.connected = True
+        mock_callback = MagicMock()
+        mqtt_client.set_callback(mock_callback)
+
+        for packet_type, payload in (
+            (PUBLISH, b"\x00"),
+            (PUBLISH, b"\x00\x05a/t"),
+            (PUBLISH | 0x02, b"\x00\x03a/t\x00"),
+        ):
+            with (
+                patch.object(
+                    mqtt_client, "_recv_packet", return_value=(packet_type, payload)
+                ),
+                patch.object(mqtt_client, "_msg_pending", return_value=True),
+            ):
+                mqtt_client.check_msg()
+
+        mock_callback.assert_not_called()
+
+    def test_check_msg_nothing_pending(self, mqtt_client):
+        """Test that check_msg returns immediately when no data is waiting."""
+        local, remote = socket.socketpair()
+        try:
+            mqtt_client.sock = local
+            mqtt_client.connected = True
+
+            with patch.object(mqtt_client, "_recv_packet") as recv_packet:
+                mqtt_client.check_msg()
+                recv_packet.assert_not_called()
+
+                remote.sendall(bytes([0xD0, 0]))
+                recv_packet.return_value = (None, None)
+                mqtt_client.check_msg()
+                recv_packet.assert_called_once()
+        finally:
+            local.close()
+            remote.close()
+
+    def test_recv_packet(self, mqtt_client):
+        """Test that _recv_packet reads exactly one packet at a time."""
+        local, remote = socket.socketpair()
+        try:
+            mqtt_client.sock = local
+            message = b"x" * 200
+            payload = b"\x00\x03a/t" + message
+            # Two packets: a PUBLISH with a 2-byte length and a PINGRESP
+            remote.sendall(bytes([PUBLISH, 205 & 0x7F | 0x80, 205 >> 7]) + payload)
+            remote.sendall(bytes([0xD0, 0]))
+
+            assert mqtt_client._recv_packet(timeout=1.0) == (PUBLISH, payload)
+            assert mqtt_client._recv_packet(timeout=1.0) == (0xD0, b"")
+
+            # A payload larger than the first read is completed in place
+            message = b"y" * 3000
+            payload = b"\x00\x03a/t" + message
+            remote.sendall(bytes([PUBLISH, 3005 & 0x7F | 0x80, 3005 >> 7]) + payload)
+            assert mqtt_client._recv_packet(timeout=1.0) == (PUBLISH, payload)
+
+            # Connection closed by the broker
+            remote.close()
+            assert mqtt_client._recv_packet(timeout=1.0) == (None, None)
+        finally:
+            local.close()
+
+    def test_recv_packet_reuses_timeout(self, mqtt_client):
+        """Test that the socket timeout is only set when it changes."""
+        mock_sock = MagicMock()
+        mock_sock.recv.return_value = b""
+        mqtt_client.sock = mock_sock
+
+        mqtt_client._recv_packet(timeout=0.5)
+        mqtt_client._recv_packet(timeout=0.5)
+        assert mock_sock.settimeout.call_count == 1
+
+        mqtt_client._recv_packet(timeout=5.0)
+        assert mock_sock.settimeout.call_count == 2
+
     def test_set_callback(self, mqtt_client):
         """Test setting a callback function."""
         # Create a mock callback
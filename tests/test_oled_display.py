@@ -2,10 +2,23 @@
 Tests for the OLED display module.
 """
 
+from unittest.mock import MagicMock, patch
+
 import pytest
+import src.esp_sensors.oled_display as oled_display
 from src.esp_sensors.oled_display import OLEDDisplay
 
 
+@pytest.fixture
+def hw_display(monkeypatch):
+    """Fixture providing a display on the hardware code path with a mock driver."""
+    display = OLEDDisplay("test_display", scl_pin=22, sda_pin=21)
+    monkeypatch.setattr(oled_display, "SIMULATION", False)
+    # A driver without partial-update support, so every flush is a show()
+    display._display = MagicMock(spec=["fill", "fill_rect", "text", "show"])
+    return display
+
+
 def test_oled_display_initialization():
     """Test that an OLED display can be initialized with valid parameters."""
     display = OLEDDisplay("test_display", scl_pin=22, sda_pin=21)
@@ -17,7 +30,7 @@ def test_oled_display_initialization():
     assert display.height == 64
     assert display.address == 0x3C
     assert display.interval == 60
-    assert display._values == []
+    assert display._values_count == 0
 
 
 def test_oled_display_custom_parameters():
@@ -64,16 +77,16 @@ def test_oled_display_metadata():
 
 
 def test_oled_display_values():
-    """Test that display values are stored correctly."""
+    """Test that the number of displayed values is tracked correctly."""
     display = OLEDDisplay("test_display", scl_pin=22, sda_pin=21)
 
     # Test with empty values
-    assert display._values == []
+    assert display._values_count == 0
 
     # Test with string values
     test_values = ["Temperature: 25.0°C", "Humidity: 45.0%"]
     display.display_values(test_values)
-    assert display._values == test_values
+    assert display._values_count == len(test_values)
 
     # Check that metadata reflects the number of values
     metadata = display.get_metadata()
@@ -87,11 +100,11 @@ def test_oled_display_clear():
     # This is mostly a coverage test since we can't check the actual display in tests
     display.clear()
 
-    # Verify that clearing doesn't affect stored values
+    # Verify that clearing doesn't affect the value count
     test_values = ["Temperature: 25.0°C"]
     display.display_values(test_values)
     display.clear()
-    assert display._values == test_values
+    assert display._values_count == len(test_values)
 
 
 def test_oled_display_text():
@@ -101,8 +114,109 @@ def test_oled_display_text():
     # This is mostly a coverage test since we can't check the actual display in tests
     display.display_text("Hello, World!")
 
-    # Verify that displaying text doesn't affect stored values
+    # Verify that displaying text doesn't affect the value count
     test_values = ["Temperature: 25.0°C"]
     display.display_values(test_values)
     display.display_text("Hello, World!")
-    assert display._values == test_values
+    assert display._values_count == len(test_values)
+
+
+def test_oled_display_skips_unchanged_lines(hw_display):
+    """Test that unchanged lines are not redrawn and show() is skipped."""
+    display = hw_display
+
+    display.display_values(["a", "b"])
+    assert display._display.text.call_count == 2
+    assert display._display.show.call_count == 1
+
+    # Same values again: nothing is drawn or sent
+    display.display_values(["a", "b"])
+    assert display._display.text.call_count == 2
+    assert display._display.show.call_count == 1
+    # Identical readings return before looking at any line
+    with patch.object(display, "_set_line_text_hw") as set_line_text:
+        display.display_values(["a", "b"])
+        set_line_text.assert_not_called()
+
+    # A shorter list redraws the changed line and clears the stale one
+    display.display_values(["c"])
+    assert display._display.text.call_count == 3
+    assert display._display.show.call_count == 2
+    assert 3 not in display._lines
+
+    # Values beyond the bottom of the screen are not drawn
+    display.display_values([str(i) for i in range(10)])
+    assert sorted(display._lines) == list(range(2, 8))
+
+
+def test_oled_display_header_shown_with_status(hw_display):
+    """Test that a header change is flushed by the next status update."""
+    display = hw_display
+
+    display.set_status("ok")
+    display.set_header("header")
+    assert display._display.show.call_count == 1
+
+    # The status is unchanged, but the pending header still has to be sent
+    display.set_status("ok")
+    assert display._display.show.call_count == 2
+    display.set_status("ok")
+    assert display._display.show.call_count == 2
+
+    # Identical values still send a pending header
+    display.display_values(["a"])
+    assert display._display.show.call_count == 3
+    display.set_header("new header")
+    display.display_values(["a"])
+    assert display._display.show.call_count == 4
+    assert display._dirty is None
+
+
+def test_oled_display_sends_only_dirty_pages(hw_display):
+    """Test that show() only transfers the pages of the changed lines."""
+    display = hw_display
+    display._display = MagicMock()
+    display._display.buffer = bytearray(range(256)) * 4
+
+    display.display_values(["a", "b"])
+    display._display.show.assert_not_called()
+    # The addressing commands are sent as one I2C command stream
+    display._display.i2c.writeto.assert_called_once_with(
+        display._display.addr, bytes([0x00, 0x21, 0, 127, 0x22, 2, 3])
+    )
+    assert bytes(display._display.write_data.call_args[0][0]) == bytes(
+        display._display.buffer[2 * 128 : 4 * 128]
+    )
+
+
+def test_oled_display_binds_hardware_methods(monkeypatch):
+    """Test that a working display binds the hardware variants at construction."""
+    monkeypatch.setattr(oled_display, "SIMULATION", False)
+    monkeypatch.setattr(oled_display, "Pin", MagicMock(), raising=False)
+    monkeypatch.setattr(oled_display, "I2C", MagicMock(), raising=False)
+    ssd1306 = MagicMock()
+    ssd1306.SSD1306_I2C.return_value.buffer = bytearray(1024)
+    monkeypatch.setattr(oled_display, "ssd1306", ssd1306, raising=False)
+
+    display = OLEDDisplay("test_display", scl_pin=22, sda_pin=21)
+    assert display.clear == display._clear_hw
+    assert display.display_values == display._display_values_hw
+
+    display.display_values(["a"])
+    assert display._values_count == 1
+    assert display._lines == {2: "a"}
+
+
+def test_oled_display_dirty_pages_narrow_display(hw_display):
+    """Test that partial updates use the centred columns of narrow displays."""
+    display = hw_display
+    display.width = 96
+    # A driver without an i2c attribute gets the commands one by one
+    display._display = MagicMock(
+        spec=["buffer", "fill_rect", "text", "show", "write_cmd", "write_data"]
+    )
+    display._display.buffer = bytearray(96 * 8)
+
+    display.set_status("ok")
+    commands = [c.args[0] for c in display._display.write_cmd.call_args_list]
+    assert commands == [0x21, 16, 111, 0x22, 1, 1]